@@ -0,0 +1,176 @@
+"""Grade distribution analytics computed with NumPy.
+
+Scores are loaded once as flat arrays (one integer code per grouping column
+plus the score), sorted by a single composite group key with the score as
+tie-breaker, and every statistic is then taken per segment with
+``reduceat``/index arithmetic, so the cost is one sort regardless of how
+many groups there are.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+
+from .extensions import db
+from .models import Classroom, Course, GradeRecord, Student
+from .system_settings import get_setting
+
+GROUP_COLUMNS = {
+    "course": GradeRecord.course_id,
+    "class": func.coalesce(Student.class_id, 0),
+    "term": GradeRecord.term,
+    "assessment_type": GradeRecord.assessment_type,
+}
+DEFAULT_GROUP_BY = ("course", "term", "assessment_type")
+PERCENTILES = {"p10": 0.10, "p25": 0.25, "median": 0.50, "p75": 0.75, "p90": 0.90}
+HISTOGRAM_BINS = 10  # 0-9, 10-19, ..., 90-100
+TREND_IDENTITY_FIELDS = {"course_id", "course_name", "class_id", "class_name", "assessment_type"}
+
+
+def load_scores(group_by: Sequence[str], filters: dict[str, Any], batch_size: int = 50000):
+    """Return ``(codes, labels, scores)``: one int32 code array and its label array per group column."""
+    statement = select(*(GROUP_COLUMNS[name] for name in group_by), GradeRecord.score)
+    if "class" in group_by or filters.get("class_id"):
+        statement = statement.join(Student, Student.id == GradeRecord.student_id)
+    if filters.get("course_id"):
+        statement = statement.where(GradeRecord.course_id == filters["course_id"])
+    if filters.get("class_id"):
+        statement = statement.where(Student.class_id == filters["class_id"])
+    if filters.get("term"):
+        statement = statement.where(GradeRecord.term == filters["term"])
+    if filters.get("assessment_type"):
+        statement = statement.where(GradeRecord.assessment_type == filters["assessment_type"])
+
+    columns: list[list[np.ndarray]] = [[] for _ in range(len(group_by) + 1)]
+    # Core execution on the session's connection: ORM row processing would
+    # cost more than the statistics themselves.
+    result = db.session.connection().execution_options(stream_results=True).execute(statement)
+    for partition in result.partitions(batch_size):
+        for index, values in enumerate(zip(*partition)):
+            dtype = np.float64 if index == len(group_by) else None
+            columns[index].append(np.asarray(values, dtype=dtype))
+    if not columns[-1]:
+        empty = np.empty(0, dtype=np.int32)
+        return [empty for _ in group_by], [np.empty(0) for _ in group_by], np.empty(0, dtype=np.float64)
+
+    codes, labels = [], []
+    for chunks in columns[:-1]:
+        values = np.concatenate(chunks)
+        unique, inverse = np.unique(values, return_inverse=True)
+        codes.append(inverse.astype(np.int32))
+        labels.append(unique)
+    return codes, labels, np.concatenate(columns[-1])
+
+
+def score_distribution(
+    group_by: Sequence[str] = DEFAULT_GROUP_BY,
+    filters: dict[str, Any] | None = None,
+    pass_mark: float | None = None,
+) -> list[dict[str, Any]]:
+    """Percentiles, mean, standard deviation, pass rate and histogram for every group."""
+    group_by = tuple(name for name in group_by if name in GROUP_COLUMNS) or DEFAULT_GROUP_BY
+    if pass_mark is None:
+        pass_mark = get_setting("grade_pass_mark")
+    codes, labels, scores = load_scores(group_by, filters or {})
+    if scores.size == 0:
+        return []
+
+    # One composite key per row, then a single lexsort: groups become
+    # contiguous segments and scores are ascending inside each segment.
+    key = np.zeros(scores.size, dtype=np.int64)
+    for code, label in zip(codes, labels):
+        key = key * len(label) + code
+    order = np.lexsort((scores, key))
+    key, scores = key[order], scores[order]
+    group_codes = [code[order] for code in codes]
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(key)) + 1))
+    counts = np.diff(np.append(starts, scores.size))
+    totals = np.add.reduceat(scores, starts)
+    means = totals / counts
+    variances = np.maximum(np.add.reduceat(scores * scores, starts) / counts - means * means, 0.0)
+    passed = np.add.reduceat((scores >= pass_mark).astype(np.int64), starts)
+
+    percentiles = {}
+    for name, fraction in PERCENTILES.items():
+        position = starts + (counts - 1) * fraction  # linear interpolation, as np.percentile
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        percentiles[name] = scores[lower] + (scores[upper] - scores[lower]) * (position - lower)
+
+    group_index = np.repeat(np.arange(starts.size), counts)
+    bins = np.clip((scores // 10).astype(np.int64), 0, HISTOGRAM_BINS - 1)
+    histograms = np.bincount(group_index * HISTOGRAM_BINS + bins, minlength=starts.size * HISTOGRAM_BINS)
+    histograms = histograms.reshape(starts.size, HISTOGRAM_BINS)
+
+    names = _display_names(group_by, labels)
+    rows = []
+    for group, start in enumerate(starts):
+        row: dict[str, Any] = {}
+        for column, code, label in zip(group_by, group_codes, labels):
+            value = label[code[start]].item()
+            row[_id_field(column)] = value
+            if column in names:
+                row[f"{column}_name"] = names[column].get(value, "未分班" if column == "class" else "")
+        row.update(
+            count=int(counts[group]),
+            mean=round(float(means[group]), 2),
+            std=round(float(np.sqrt(variances[group])), 2),
+            min=float(scores[start]),
+            max=float(scores[start + counts[group] - 1]),
+            pass_rate=round(float(passed[group]) / int(counts[group]), 4),
+            histogram=histograms[group].tolist(),
+            **{name: round(float(values[group]), 2) for name, values in percentiles.items()},
+        )
+        rows.append(row)
+    return rows
+
+
+def term_trends(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Group distribution rows by everything except term and compare consecutive terms."""
+    series: dict[tuple, list[dict[str, Any]]] = {}
+    for row in rows:
+        if "term" not in row:
+            return []
+        identity = tuple((field, value) for field, value in row.items() if field in TREND_IDENTITY_FIELDS)
+        series.setdefault(identity, []).append(row)
+
+    trends = []
+    for identity, points in series.items():
+        points.sort(key=lambda point: point["term"])
+        previous = None
+        terms = []
+        for point in points:
+            terms.append(
+                {
+                    "term": point["term"],
+                    "count": point["count"],
+                    "mean": point["mean"],
+                    "median": point["median"],
+                    "pass_rate": point["pass_rate"],
+                    "mean_change": round(point["mean"] - previous["mean"], 2) if previous else None,
+                    "pass_rate_change": round(point["pass_rate"] - previous["pass_rate"], 4) if previous else None,
+                }
+            )
+            previous = point
+        trends.append({**dict(identity), "terms": terms})
+    return trends
+
+
+def _id_field(column: str) -> str:
+    return {"course": "course_id", "class": "class_id"}.get(column, column)
+
+
+def _display_names(group_by: Sequence[str], labels: list[np.ndarray]) -> dict[str, dict[int, str]]:
+    names: dict[str, dict[int, str]] = {}
+    for column, label in zip(group_by, labels):
+        if column == "course":
+            ids = label.tolist()
+            names[column] = dict(db.session.query(Course.id, Course.name).filter(Course.id.in_(ids)).all())
+        elif column == "class":
+            ids = label.tolist()
+            names[column] = dict(db.session.query(Classroom.id, Classroom.name).filter(Classroom.id.in_(ids)).all())
+    return names
@@ -1,10 +1,14 @@
-from datetime import datetime
+from datetime import date, datetime
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from flask_login import current_user, login_required
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import exists, insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
+from .analytics import DEFAULT_GROUP_BY, score_distribution, term_trends
+from .dashboard_cache import dashboard_summary
 from .extensions import db
+from .gpa import class_ranking, student_gpa
 from .models import (
     Announcement,
     AttendanceRecord,
@@ -13,13 +17,70 @@ from .models import (
     GradeRecord,
     Student,
     TodoItem,
+    course_students,
+)
+from .search import get_search_backend
+from .suggest import SOURCES, suggest_index
+from .utils import (
+    conditional_get,
+    keyset_paginate,
+    log_operation,
+    ndjson_response,
+    permission_required,
+    upsert_grade_scores,
 )
 
 api_bp = Blueprint("api", __name__)
 
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+STUDENT_FIELDS = {
+    "id": Student.id,
+    "student_number": Student.student_number,
+    "name": Student.name,
+    "gender": Student.gender,
+    "date_of_birth": Student.date_of_birth,
+    "class_id": Student.class_id,
+    "class_name": Classroom.name,
+    "email": Student.email,
+    "phone": Student.phone,
+    "address": Student.address,
+    "enrollment_date": Student.enrollment_date,
+}
+STUDENT_DEFAULT_FIELDS = (
+    "id",
+    "student_number",
+    "name",
+    "gender",
+    "date_of_birth",
+    "class_id",
+    "email",
+    "phone",
+    "address",
+)
+GRADE_FIELDS = {
+    "id": GradeRecord.id,
+    "student_id": GradeRecord.student_id,
+    "student_number": Student.student_number,
+    "student_name": Student.name,
+    "course_id": GradeRecord.course_id,
+    "course": Course.name,
+    "term": GradeRecord.term,
+    "assessment_type": GradeRecord.assessment_type,
+    "score": GradeRecord.score,
+    "remark": GradeRecord.remark,
+    "recorded_at": GradeRecord.recorded_at,
+}
+ATTENDANCE_FIELDS = ("id", "student_id", "course_id", "record_date", "status", "remarks")
+GRADE_DEFAULT_FIELDS = ("id", "student_number", "student_name", "course", "term", "assessment_type", "score")
+
 
 def _parse_date(value: str) -> datetime.date:
-    return datetime.strptime(value, "%Y-%m-%d").date()
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as exc:
+        raise ValueError(f"日期格式不正确，应为 YYYY-MM-DD: {value}") from exc
 
 
 def _require_text(data: dict, field: str) -> str:
@@ -32,23 +93,188 @@ def _require_text(data: dict, field: str) -> str:
     return text
 
 
+def _resolve_class_id(payload: dict, classes: dict[str, int]) -> int | None:
+    """``class_id`` wins over ``class_name``; neither means the student has no class."""
+    class_id = payload.get("class_id")
+    if class_id not in (None, ""):
+        try:
+            class_id = int(class_id)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("class_id 必须为整数") from exc
+        if class_id not in classes.values():
+            raise ValueError(f"班级不存在: {class_id}")
+        return class_id
+    class_name = str(payload.get("class_name") or "").strip()
+    if not class_name:
+        return None
+    if class_name not in classes:
+        raise ValueError(f"班级不存在: {class_name}")
+    return classes[class_name]
+
+
+def _student_values(payload: dict, classes: dict[str, int] | None = None) -> dict:
+    """Validate one student payload; ``classes`` is the ``{name: id}`` map (loaded when omitted)."""
+    if not isinstance(payload, dict):
+        raise ValueError("每条数据应为对象")
+    if classes is None:
+        classes = dict(db.session.query(Classroom.name, Classroom.id).all())
+    return {
+        "student_number": _require_text(payload, "student_number"),
+        "name": _require_text(payload, "name"),
+        "gender": _require_text(payload, "gender"),
+        "date_of_birth": _parse_date(_require_text(payload, "date_of_birth")),
+        "class_id": _resolve_class_id(payload, classes),
+        "email": _require_text(payload, "email"),
+        "phone": _require_text(payload, "phone"),
+        "address": str(payload.get("address", "")).strip() or None,
+    }
+
+
+def _batch_request() -> tuple[list, bool, int]:
+    """Parse a batch body (an array, or ``{"items": [...], "atomic": bool, "chunk_size": int}``)."""
+    payload = request.get_json(force=True, silent=False)
+    if isinstance(payload, list):
+        items, options = payload, {}
+    elif isinstance(payload, dict) and isinstance(payload.get("items"), list):
+        items, options = payload["items"], payload
+    else:
+        raise ValueError("请求体应为数组或包含 items 数组的对象")
+    max_items = current_app.config.get("API_BATCH_MAX_ITEMS", 5000)
+    if not items:
+        raise ValueError("items 不能为空")
+    if len(items) > max_items:
+        raise ValueError(f"单次最多提交 {max_items} 条")
+    atomic = bool(options.get("atomic"))
+    try:
+        chunk_size = int(options.get("chunk_size") or current_app.config.get("API_BATCH_CHUNK_SIZE", 0))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("chunk_size 必须为整数") from exc
+    if atomic or chunk_size <= 0:
+        chunk_size = len(items)
+    return items, atomic, chunk_size
+
+
+def _run_batch(items: list, validate, write_chunk, atomic: bool, chunk_size: int):
+    """Validate every item, then write the valid ones chunk by chunk, one transaction per chunk.
+
+    ``validate(item)`` returns the values to write or raises ``ValueError``;
+    ``write_chunk([(index, values), ...])`` returns one ``{"status": ..., ...}``
+    per entry.  With ``atomic`` nothing is written when any item is invalid.
+    """
+    results: list[dict] = [{"index": index} for index in range(len(items))]
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, validate(item)))
+        except ValueError as exc:
+            results[index].update(status="error", error=str(exc))
+    failed = len(items) - len(valid)
+    if atomic and failed:
+        for index, _ in valid:
+            results[index]["status"] = "skipped"
+    else:
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start : start + chunk_size]
+            try:
+                outcomes = write_chunk(chunk)
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                current_app.logger.exception("batch chunk failed")
+                outcomes = [{"status": "error", "error": "写入失败，该批次已回滚"}] * len(chunk)
+            for (index, _), outcome in zip(chunk, outcomes):
+                results[index].update(outcome)
+
+    summary = dict.fromkeys(("created", "updated", "unchanged", "skipped", "error"), 0)
+    for result in results:
+        summary[result["status"]] += 1
+    return jsonify({"summary": summary, "results": results}), 422 if atomic and failed else 200
+
+
 @api_bp.errorhandler(ValueError)
 def handle_value_error(error: ValueError):
     return jsonify({"error": str(error)}), 400
 
 
+def _requested_fields(available: dict, default: tuple[str, ...]) -> list[str]:
+    names = [name.strip() for name in request.args.get("fields", "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"未知字段: {', '.join(unknown)}")
+    return list(dict.fromkeys(names)) or list(default)
+
+
+def _page_size() -> int:
+    limit = request.args.get("limit", default=current_app.config.get("API_PAGE_SIZE", 100), type=int)
+    return min(max(limit, 1), current_app.config.get("API_MAX_PAGE_SIZE", 1000))
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _wants_ndjson() -> bool:
+    return request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def _collection_response(query, sort_columns: list, fields: list[str], descending: bool = False):
+    """One keyset page as JSON, or with ``Accept: application/x-ndjson`` every matching row as a stream."""
+    if _wants_ndjson():
+        ordered = query.order_by(*(column.desc() if descending else column.asc() for column in sort_columns))
+        rows = ordered.yield_per(current_app.config.get("API_STREAM_BATCH_SIZE", 1000))
+        return ndjson_response({name: getattr(row, name) for name in fields} for row in rows)
+    page = keyset_paginate(
+        query, sort_columns, request.args.get("cursor"), per_page=_page_size(), descending=descending, with_total=False
+    )
+    return jsonify(
+        {
+            "items": [{name: _json_value(getattr(row, name)) for name in fields} for row in page.items],
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor,
+        }
+    )
+
+
 @api_bp.get("/students")
+# term/course_id filter through grade_records/course_students, which have no
+# change counter (bumping one on every grade write would serialize them).
+@conditional_get("students", "classrooms", unversioned_args=("term", "course_id"))
 def api_list_students():
-    query = Student.query.order_by(Student.student_number.asc())
-    search_term = request.args.get("q", type=str, default="").strip()
-    if search_term:
-        like_term = f"%{search_term}%"
-        query = query.filter(
-            (Student.student_number.ilike(like_term))
-            | (Student.name.ilike(like_term))
-            | (Student.class_name.ilike(like_term))
+    fields = _requested_fields(STUDENT_FIELDS, STUDENT_DEFAULT_FIELDS)
+    sort_columns = [Student.student_number]
+    columns = {name: STUDENT_FIELDS[name] for name in fields}
+    columns["student_number"] = Student.student_number
+    filters = []
+    class_id = request.args.get("class_id", type=int)
+    if class_id:
+        filters.append(Student.class_id == class_id)
+    class_name = request.args.get("class_name", "").strip()
+    if class_name:
+        filters.append(Classroom.name == class_name)
+    gender = request.args.get("gender", "").strip()
+    if gender:
+        filters.append(Student.gender == gender)
+    course_id = request.args.get("course_id", type=int)
+    if course_id:
+        filters.append(
+            exists().where(course_students.c.student_id == Student.id, course_students.c.course_id == course_id)
         )
-    return jsonify([student.to_dict() for student in query.all()])
+    term = request.args.get("term", "").strip()
+    if term:
+        filters.append(exists().where(GradeRecord.student_id == Student.id, GradeRecord.term == term))
+
+    search_term = request.args.get("q", type=str, default="").strip()
+    matches = get_search_backend().student_matches(search_term) if search_term else None
+    if matches is not None:
+        sort_columns = [matches.c.score, Student.id]
+        columns.update(score=matches.c.score, id=Student.id)
+
+    query = db.session.query(*(column.label(name) for name, column in columns.items())).select_from(Student)
+    if matches is not None:
+        query = query.join(matches, matches.c.id == Student.id)
+    if "class_name" in fields or class_name:
+        query = query.outerjoin(Classroom, Classroom.id == Student.class_id)
+    return _collection_response(query.filter(*filters), sort_columns, fields, descending=matches is not None)
 
 
 @api_bp.post("/students")
@@ -57,16 +283,7 @@ def api_create_student():
     if not payload:
         raise ValueError("请求体不能为空")
 
-    student = Student(
-        student_number=_require_text(payload, "student_number"),
-        name=_require_text(payload, "name"),
-        gender=_require_text(payload, "gender"),
-        date_of_birth=_parse_date(_require_text(payload, "date_of_birth")),
-        class_name=_require_text(payload, "class_name"),
-        email=_require_text(payload, "email"),
-        phone=_require_text(payload, "phone"),
-        address=str(payload.get("address", "")).strip() or None,
-    )
+    student = Student(**_student_values(payload))
 
     db.session.add(student)
     try:
@@ -78,6 +295,58 @@ def api_create_student():
     return jsonify(student.to_dict()), 201
 
 
+@api_bp.post("/students:batch")
+@login_required
+@permission_required("students.manage")
+def api_batch_students():
+    """Create or update students by ``student_number``."""
+    items, atomic, chunk_size = _batch_request()
+    classes = dict(db.session.query(Classroom.name, Classroom.id).all())
+    seen: set[str] = set()
+
+    def validate(item) -> dict:
+        values = _student_values(item, classes)
+        if values["student_number"] in seen:
+            raise ValueError(f"学号在本批次中重复: {values['student_number']}")
+        seen.add(values["student_number"])
+        return values
+
+    def write_chunk(chunk: list[tuple[int, dict]]) -> list[dict]:
+        numbers = [values["student_number"] for _, values in chunk]
+        existing = {
+            student.student_number: student for student in Student.query.filter(Student.student_number.in_(numbers))
+        }
+        inserts = [
+            {**values, "enrollment_date": date.today()}
+            for _, values in chunk
+            if values["student_number"] not in existing
+        ]
+        if inserts:
+            db.session.execute(insert(Student), inserts)
+        # Existing students go through the unit of work so that class moves
+        # reach the grade and attendance rollups.
+        outcomes = {}
+        for _, values in chunk:
+            student = existing.get(values["student_number"])
+            if student is None:
+                continue
+            changed = {field: value for field, value in values.items() if getattr(student, field) != value}
+            for field, value in changed.items():
+                setattr(student, field, value)
+            outcomes[student.student_number] = {"status": "updated" if changed else "unchanged", "id": student.id}
+        db.session.flush()
+        if inserts:
+            created = db.session.query(Student.student_number, Student.id).filter(
+                Student.student_number.in_([values["student_number"] for values in inserts])
+            )
+            outcomes.update({number: {"status": "created", "id": student_id} for number, student_id in created})
+        return [outcomes[values["student_number"]] for _, values in chunk]
+
+    response = _run_batch(items, validate, write_chunk, atomic, chunk_size)
+    log_operation(current_user.id, "update", "student", f"批量写入学生 {len(items)} 条")
+    return response
+
+
 @api_bp.get("/students/<int:student_id>")
 def api_get_student(student_id: int):
     student = Student.query.get_or_404(student_id)
@@ -91,14 +360,8 @@ def api_update_student(student_id: int):
     if not payload:
         raise ValueError("请求体不能为空")
 
-    student.student_number = _require_text(payload, "student_number")
-    student.name = _require_text(payload, "name")
-    student.gender = _require_text(payload, "gender")
-    student.date_of_birth = _parse_date(_require_text(payload, "date_of_birth"))
-    student.class_name = _require_text(payload, "class_name")
-    student.email = _require_text(payload, "email")
-    student.phone = _require_text(payload, "phone")
-    student.address = str(payload.get("address", "")).strip() or None
+    for field, value in _student_values(payload).items():
+        setattr(student, field, value)
 
     try:
         db.session.commit()
@@ -117,21 +380,45 @@ def api_delete_student(student_id: int):
     return jsonify({"status": "deleted", "id": student_id})
 
 
+@api_bp.get("/students/<int:student_id>/gpa")
+@login_required
+def api_student_gpa(student_id: int):
+    student = Student.query.get_or_404(student_id)
+    rows = student_gpa(student, request.args.get("term", "").strip() or None)
+    return jsonify(
+        {
+            "student_id": student.id,
+            "student_number": student.student_number,
+            "name": student.name,
+            "terms": [row.to_dict() for row in rows],
+        }
+    )
+
+
+@api_bp.get("/suggest")
+@login_required
+def api_suggest():
+    types = {kind for kind in request.args.get("types", "").split(",") if kind in SOURCES}
+    limit = min(max(request.args.get("limit", default=10, type=int), 1), 20)
+    return jsonify(suggest_index.lookup(request.args.get("q", ""), types or None, limit))
+
+
 @api_bp.get("/dashboard/summary")
 @login_required
 def api_dashboard_summary():
+    summary = dashboard_summary()
     return jsonify(
         {
-            "students": Student.query.count(),
-            "classes": Classroom.query.count(),
-            "teachers": Course.query.distinct(Course.teacher_id).count(),
-            "courses": Course.query.count(),
+            **summary["counts"],
+            "grade_averages": [{"course": name, "average": round(avg, 2)} for name, avg in summary["grade_stats"]],
+            "attendance_30d": dict(summary["attendance_stats"]),
         }
     )
 
 
 @api_bp.get("/classes")
 @login_required
+@conditional_get("classrooms", "students")
 def api_list_classes():
     classrooms = Classroom.query.order_by(Classroom.name.asc()).all()
     return jsonify(
@@ -148,8 +435,27 @@ def api_list_classes():
     )
 
 
+@api_bp.get("/classes/<int:class_id>/ranking")
+@login_required
+def api_class_ranking(class_id: int):
+    classroom = Classroom.query.get_or_404(class_id)
+    term, rows = class_ranking(classroom, request.args.get("term", "").strip() or None)
+    return jsonify(
+        {
+            "class_id": classroom.id,
+            "class_name": classroom.name,
+            "term": term,
+            "ranking": [
+                {**row.to_dict(), "student_number": student.student_number, "name": student.name}
+                for row, student in rows
+            ],
+        }
+    )
+
+
 @api_bp.get("/courses")
 @login_required
+@conditional_get("courses")
 def api_list_courses():
     courses = Course.query.order_by(Course.name.asc()).all()
     return jsonify(
@@ -170,57 +476,137 @@ def api_list_courses():
 @api_bp.get("/grades")
 @login_required
 def api_list_grades():
-    records = (
-        db.session.query(
-            GradeRecord.id,
-            Student.student_number,
-            Student.name,
-            Course.name,
-            GradeRecord.term,
-            GradeRecord.assessment_type,
-            GradeRecord.score,
-        )
-        .join(Student, Student.id == GradeRecord.student_id)
-        .join(Course, Course.id == GradeRecord.course_id)
-        .all()
-    )
-    return jsonify(
-        [
-            {
-                "id": record_id,
-                "student_number": student_number,
-                "student_name": student_name,
-                "course": course_name,
-                "term": term,
-                "assessment_type": assessment_type,
-                "score": score,
-            }
-            for record_id, student_number, student_name, course_name, term, assessment_type, score in records
-        ]
+    fields = _requested_fields(GRADE_FIELDS, GRADE_DEFAULT_FIELDS)
+    columns = {name: GRADE_FIELDS[name] for name in fields}
+    columns["id"] = GradeRecord.id
+    filters = []
+    for name in ("student_id", "course_id"):
+        value = request.args.get(name, type=int)
+        if value:
+            filters.append(GRADE_FIELDS[name] == value)
+    for name in ("term", "assessment_type"):
+        value = request.args.get(name, "").strip()
+        if value:
+            filters.append(GRADE_FIELDS[name] == value)
+    class_id = request.args.get("class_id", type=int)
+    if class_id:
+        filters.append(Student.class_id == class_id)
+    gender = request.args.get("gender", "").strip()
+    if gender:
+        filters.append(Student.gender == gender)
+
+    query = db.session.query(*(column.label(name) for name, column in columns.items())).select_from(GradeRecord)
+    if class_id or gender or any(GRADE_FIELDS[name].class_ is Student for name in fields):
+        query = query.join(Student, Student.id == GradeRecord.student_id)
+    if any(GRADE_FIELDS[name].class_ is Course for name in fields):
+        query = query.join(Course, Course.id == GradeRecord.course_id)
+    return _collection_response(query.filter(*filters), [GradeRecord.id], fields)
+
+
+@api_bp.post("/grades:batch")
+@login_required
+@permission_required("grades.manage")
+def api_batch_grades():
+    """Create or update scores by (student, course, term, assessment type)."""
+    items, atomic, chunk_size = _batch_request()
+    dict_items = [item for item in items if isinstance(item, dict)]
+    numbers = {str(item["student_number"]).strip() for item in dict_items if item.get("student_number")}
+    student_ids = {item["student_id"] for item in dict_items if isinstance(item.get("student_id"), int)}
+    students_by_number = dict(
+        db.session.query(Student.student_number, Student.id).filter(Student.student_number.in_(numbers)).all()
     )
+    known_students = set(students_by_number.values())
+    known_students |= {student_id for (student_id,) in db.session.query(Student.id).filter(Student.id.in_(student_ids))}
+    courses_by_code = dict(db.session.query(Course.code, Course.id).all())
+    seen: set[tuple] = set()
+
+    def resolve(item: dict, id_field: str, code_field: str, by_code: dict, known: set, label: str) -> int:
+        value = item.get(id_field)
+        if value not in (None, ""):
+            if isinstance(value, bool) or not isinstance(value, int) or value not in known:
+                raise ValueError(f"{label}不存在: {value}")
+            return value
+        code = str(item.get(code_field) or "").strip()
+        if not code:
+            raise ValueError(f"缺少字段: {id_field} 或 {code_field}")
+        if code not in by_code:
+            raise ValueError(f"{label}不存在: {code}")
+        return by_code[code]
+
+    def validate(item) -> tuple:
+        if not isinstance(item, dict):
+            raise ValueError("每条数据应为对象")
+        student_id = resolve(item, "student_id", "student_number", students_by_number, known_students, "学生")
+        course_id = resolve(item, "course_id", "course_code", courses_by_code, set(courses_by_code.values()), "课程")
+        term = _require_text(item, "term")
+        assessment_type = _require_text(item, "assessment_type")
+        try:
+            score = float(item.get("score"))
+        except (TypeError, ValueError) as exc:
+            raise ValueError("score 必须为数字") from exc
+        if not 0 <= score <= 100:
+            raise ValueError("score 应在 0 到 100 之间")
+        key = (student_id, course_id, term, assessment_type)
+        if key in seen:
+            raise ValueError("同一学生、课程、学期与考核类型在本批次中重复")
+        seen.add(key)
+        return key + (score,)
+
+    def write_chunk(chunk: list[tuple[int, tuple]]) -> list[dict]:
+        groups: dict[tuple, dict[int, float]] = {}
+        for _, (student_id, course_id, term, assessment_type, score) in chunk:
+            groups.setdefault((course_id, term, assessment_type), {})[student_id] = score
+        statuses = {
+            (student_id, *group): status
+            for group, scores in groups.items()
+            for student_id, status in upsert_grade_scores(*group, scores).items()
+        }
+        return [{"status": statuses[values[:4]]} for _, values in chunk]
+
+    response = _run_batch(items, validate, write_chunk, atomic, chunk_size)
+    log_operation(current_user.id, "update", "grade", f"批量写入成绩 {len(items)} 条")
+    return response
+
+
+@api_bp.get("/grades/analytics")
+@login_required
+def api_grade_analytics():
+    group_by = [name for name in request.args.get("group_by", "").split(",") if name] or DEFAULT_GROUP_BY
+    filters = {
+        "class_id": request.args.get("class_id", type=int),
+        "course_id": request.args.get("course_id", type=int),
+        "term": request.args.get("term", "").strip(),
+        "assessment_type": request.args.get("assessment_type", "").strip(),
+    }
+    distribution = score_distribution(group_by, filters, request.args.get("pass_mark", type=float))
+    return jsonify({"groups": distribution, "trends": term_trends(distribution)})
 
 
 @api_bp.get("/attendance")
 @login_required
 def api_attendance_records():
-    records = AttendanceRecord.query.order_by(AttendanceRecord.record_date.desc()).limit(200).all()
-    return jsonify(
-        [
-            {
-                "id": record.id,
-                "student_id": record.student_id,
-                "course_id": record.course_id,
-                "record_date": record.record_date.isoformat(),
-                "status": record.status,
-                "remarks": record.remarks,
-            }
-            for record in records
-        ]
-    )
+    columns = {name: getattr(AttendanceRecord, name) for name in ATTENDANCE_FIELDS}
+    filters = []
+    for name in ("student_id", "course_id"):
+        value = request.args.get(name, type=int)
+        if value:
+            filters.append(columns[name] == value)
+    start_date = request.args.get("start_date", "").strip()
+    if start_date:
+        filters.append(AttendanceRecord.record_date >= _parse_date(start_date))
+    end_date = request.args.get("end_date", "").strip()
+    if end_date:
+        filters.append(AttendanceRecord.record_date <= _parse_date(end_date))
+    query = db.session.query(*(column.label(name) for name, column in columns.items())).filter(*filters)
+    if _wants_ndjson():
+        return _collection_response(query, [AttendanceRecord.id], list(ATTENDANCE_FIELDS))
+    records = query.order_by(AttendanceRecord.record_date.desc()).limit(200).all()
+    return jsonify([{name: _json_value(getattr(record, name)) for name in ATTENDANCE_FIELDS} for record in records])
 
 
 @api_bp.get("/announcements")
 @login_required
+@conditional_get("announcements")
 def api_list_announcements():
     announcements = Announcement.query.order_by(Announcement.created_at.desc()).all()
     return jsonify(
@@ -0,0 +1,214 @@
+"""Keeps ``attendance_daily`` in step with ``attendance_records``.
+
+Each rollup row counts the records of one (date, class, course, status).
+Writes turn into +1/-1 deltas applied with a single counter upsert inside
+the writing transaction: unit of work writes are collected by mapper events
+and applied in an ``after_flush`` hook, the bulk path in
+``utils.save_attendance_records`` calls :func:`apply_attendance_deltas` itself.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from datetime import date
+
+import click
+from flask import Flask
+from sqlalchemy import delete, event, func, insert, inspect, select, tuple_, update
+from sqlalchemy.orm import Session, object_session
+
+from .extensions import db
+from .models import AttendanceDaily, AttendanceRecord, Student
+
+DailyKey = tuple[date, int, int, str]  # (record_date, class_id or 0, course_id or 0, status)
+
+KEY_COLUMNS = ("record_date", "class_id", "course_id", "status")
+
+
+def daily_key(record_date: date, class_id: int | None, course_id: int | None, status: str) -> DailyKey:
+    return (record_date, class_id or 0, course_id or 0, status)
+
+
+def apply_attendance_deltas(connection, deltas: Counter) -> None:
+    """Add ``{key: change}`` to the rollup counts using the writing transaction's ``connection``."""
+    changes = {key: change for key, change in deltas.items() if change}
+    if not changes:
+        return
+    table = AttendanceDaily.__table__
+    rows = [dict(zip(KEY_COLUMNS, key), record_count=change) for key, change in sorted(changes.items())]
+    dialect = connection.dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(record_count=table.c.record_count + stmt.inserted.record_count)
+        connection.execute(stmt, rows)
+    elif dialect in {"sqlite", "postgresql"}:
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={"record_count": table.c.record_count + stmt.excluded.record_count},
+        )
+        connection.execute(stmt, rows)
+    else:
+        for row in rows:
+            where = [table.c[name] == row[name] for name in KEY_COLUMNS]
+            updated = connection.execute(
+                update(table).where(*where).values(record_count=table.c.record_count + row["record_count"])
+            ).rowcount
+            if not updated:
+                connection.execute(insert(table).values(**row))
+
+    removed = [key for key, change in changes.items() if change < 0]
+    if removed:
+        connection.execute(
+            delete(table).where(
+                tuple_(*(table.c[name] for name in KEY_COLUMNS)).in_(removed), table.c.record_count <= 0
+            )
+        )
+
+
+def recount_attendance(connection, record_date: date, course_id: int | None, class_ids) -> None:
+    """Recount the rollup rows of one date and course for ``class_ids`` straight from ``attendance_records``."""
+    table = AttendanceDaily.__table__
+    class_keys = {class_id or 0 for class_id in class_ids}
+    connection.execute(
+        delete(table).where(
+            table.c.record_date == record_date,
+            table.c.course_id == (course_id or 0),
+            table.c.class_id.in_(class_keys),
+        )
+    )
+    class_id = func.coalesce(Student.class_id, 0)
+    source = (
+        select(AttendanceRecord.record_date, class_id, AttendanceRecord.course_key, AttendanceRecord.status, func.count())
+        .join(Student, Student.id == AttendanceRecord.student_id)
+        .where(
+            AttendanceRecord.record_date == record_date,
+            AttendanceRecord.course_key == (course_id or 0),
+            class_id.in_(class_keys),
+        )
+        .group_by(AttendanceRecord.record_date, class_id, AttendanceRecord.course_key, AttendanceRecord.status)
+    )
+    connection.execute(insert(table).from_select([*KEY_COLUMNS, "record_count"], source))
+
+
+def _previous(state, attribute: str):
+    """Value ``attribute`` had before this flush (the columns involved are ``active_history``)."""
+    history = state.attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.added:
+        return None  # changed from NULL
+    return getattr(state.object, attribute)
+
+
+def _class_id(connection, student_id: int):
+    return connection.execute(select(Student.class_id).where(Student.id == student_id)).scalar()
+
+
+def _pending(target) -> Counter | None:
+    session = object_session(target)
+    return session.info.setdefault("attendance_deltas", Counter()) if session is not None else None
+
+
+def _old_key(connection, target) -> DailyKey:
+    state = inspect(target)
+    return daily_key(
+        _previous(state, "record_date"),
+        _class_id(connection, _previous(state, "student_id")),
+        _previous(state, "course_id"),
+        _previous(state, "status"),
+    )
+
+
+def _new_key(connection, target) -> DailyKey:
+    return daily_key(target.record_date, _class_id(connection, target.student_id), target.course_id, target.status)
+
+
+# Mapper events rather than ``session.new``/``dirty``/``deleted``: they also
+# fire for rows removed by a delete-orphan cascade during the flush.
+@event.listens_for(AttendanceRecord, "after_insert")
+def _record_inserted(mapper, connection, target) -> None:
+    deltas = _pending(target)
+    if deltas is not None:
+        deltas[_new_key(connection, target)] += 1
+
+
+@event.listens_for(AttendanceRecord, "after_update")
+def _record_updated(mapper, connection, target) -> None:
+    deltas = _pending(target)
+    if deltas is not None:
+        deltas[_old_key(connection, target)] -= 1
+        deltas[_new_key(connection, target)] += 1
+
+
+@event.listens_for(AttendanceRecord, "before_delete")
+def _record_deleted(mapper, connection, target) -> None:
+    # Before the DELETE, so the student row (deleted later in the same flush) is still there.
+    deltas = _pending(target)
+    if deltas is not None:
+        deltas[_old_key(connection, target)] -= 1
+
+
+@event.listens_for(Student, "after_update")
+def _student_moved(mapper, connection, target) -> None:
+    # Students are written before their attendance records, so record events
+    # later in this flush already see the new class.
+    if not inspect(target).attrs.class_id.history.has_changes():
+        return
+    old_class = _previous(inspect(target), "class_id")
+    deltas = _pending(target)
+    if deltas is None or old_class == target.class_id:
+        return
+    records = connection.execute(
+        select(AttendanceRecord.record_date, AttendanceRecord.course_id, AttendanceRecord.status).where(
+            AttendanceRecord.student_id == target.id
+        )
+    ).all()
+    for record_date, course_id, status in records:
+        deltas[daily_key(record_date, old_class, course_id, status)] -= 1
+        deltas[daily_key(record_date, target.class_id, course_id, status)] += 1
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_pending_deltas(session, flush_context) -> None:
+    deltas = session.info.pop("attendance_deltas", None)
+    if deltas:
+        apply_attendance_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_deltas(session, previous_transaction) -> None:
+    session.info.pop("attendance_deltas", None)
+
+
+def rebuild_attendance_rollup() -> int:
+    """Recompute ``attendance_daily`` from ``attendance_records``; return the number of rows written."""
+    table = AttendanceDaily.__table__
+    class_id = func.coalesce(Student.class_id, 0)
+    course_id = func.coalesce(AttendanceRecord.course_id, 0)
+    source = (
+        select(
+            AttendanceRecord.record_date, class_id, course_id, AttendanceRecord.status, func.count(AttendanceRecord.id)
+        )
+        .join(Student, Student.id == AttendanceRecord.student_id)
+        .group_by(AttendanceRecord.record_date, class_id, course_id, AttendanceRecord.status)
+    )
+    db.session.execute(delete(table))
+    db.session.execute(insert(table).from_select([*KEY_COLUMNS, "record_count"], source))
+    db.session.commit()
+    return db.session.query(func.count(AttendanceDaily.id)).scalar() or 0
+
+
+def init_app(app: Flask) -> None:
+    @app.cli.command("rebuild-attendance-rollup")
+    def rebuild_command() -> None:
+        """Backfill attendance_daily from attendance_records."""
+        rows = rebuild_attendance_rollup()
+        click.echo(f"rebuilt {rows} daily attendance rows")
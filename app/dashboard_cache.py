@@ -0,0 +1,221 @@
+"""Process-wide cache for the dashboard blocks.
+
+Global blocks (counts, announcements, grade and attendance charts) are
+shared by every user; per-user blocks (todos, unread messages) are keyed by
+user id.  Each block lists the models it is built from: mapper events on
+those models record which blocks a transaction touched and the entries are
+dropped once it commits.  Bulk statements are caught through
+``do_orm_execute``.  ``DASHBOARD_CACHE_TTL`` bounds staleness across worker
+processes.  Values are plain dicts/tuples, never ORM instances.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Hashable
+
+from flask import current_app
+from sqlalchemy import case, event
+from sqlalchemy.orm import Session, object_session
+
+from .extensions import db
+from .models import (
+    Announcement,
+    AttendanceDaily,
+    AttendanceRecord,
+    Classroom,
+    Course,
+    GradeAggregate,
+    GradeRecord,
+    Student,
+    SystemMessage,
+    Teacher,
+    TodoItem,
+)
+
+GLOBAL_BLOCKS = {
+    "counts": (Student, Classroom, Teacher, Course),
+    "announcements": (Announcement,),
+    "grade_stats": (Course, GradeRecord),
+    "attendance_stats": (AttendanceRecord,),
+}
+USER_BLOCKS = {"todos": TodoItem, "messages": SystemMessage}
+
+
+class DashboardCache:
+    def __init__(self) -> None:
+        self.version = 0
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        version = self.version
+        value = loader()
+        ttl = current_app.config.get("DASHBOARD_CACHE_TTL", 60)
+        with self._lock:
+            # Skip the store when an invalidation ran while loading.
+            if version == self.version:
+                self._entries[key] = (now + ttl, value)
+        return value
+
+    def invalidate(self, blocks: set[Hashable] | None = None) -> None:
+        """Drop ``blocks`` (block names or ``(block, user_id)`` keys); everything when omitted."""
+        with self._lock:
+            self.version += 1
+            if blocks is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                name = key[0] if isinstance(key, tuple) else key
+                if key in blocks or name in blocks:
+                    del self._entries[key]
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+dashboard_cache = DashboardCache()
+
+
+def _counts() -> dict[str, int]:
+    return {
+        "students": Student.query.count(),
+        "classes": Classroom.query.count(),
+        "teachers": Teacher.query.count(),
+        "courses": Course.query.count(),
+    }
+
+
+def _announcements() -> list[dict[str, Any]]:
+    rows = (
+        db.session.query(Announcement.id, Announcement.title, Announcement.content, Announcement.created_at)
+        .order_by(Announcement.is_pinned.desc(), Announcement.created_at.desc())
+        .limit(5)
+        .all()
+    )
+    return [row._asdict() for row in rows]
+
+
+def _grade_stats() -> list[tuple[str, float]]:
+    rows = (
+        db.session.query(
+            Course.name, db.func.sum(GradeAggregate.score_sum) / db.func.sum(GradeAggregate.score_count)
+        )
+        .join(GradeAggregate, GradeAggregate.course_id == Course.id)
+        .group_by(Course.id)
+        .order_by(Course.name.asc())
+        .limit(6)
+        .all()
+    )
+    return [(name, float(avg or 0)) for name, avg in rows]
+
+
+def _attendance_stats(since: date) -> list[tuple[str, int]]:
+    rows = (
+        db.session.query(AttendanceDaily.status, db.func.sum(AttendanceDaily.record_count))
+        .filter(AttendanceDaily.record_date >= since)
+        .group_by(AttendanceDaily.status)
+        .all()
+    )
+    return [(status, int(count)) for status, count in rows]
+
+
+def _todos(user_id: int) -> list[dict[str, Any]]:
+    rows = (
+        db.session.query(TodoItem.id, TodoItem.content, TodoItem.due_date)
+        .filter(TodoItem.user_id == user_id, TodoItem.is_completed.is_(False))
+        .order_by(case((TodoItem.due_date.is_(None), 1), else_=0), TodoItem.due_date.asc())
+        .limit(5)
+        .all()
+    )
+    return [row._asdict() for row in rows]
+
+
+def _messages(user_id: int) -> list[dict[str, Any]]:
+    rows = (
+        db.session.query(SystemMessage.id, SystemMessage.title, SystemMessage.body, SystemMessage.created_at)
+        .filter(SystemMessage.user_id == user_id, SystemMessage.is_read.is_(False))
+        .order_by(SystemMessage.created_at.desc())
+        .limit(5)
+        .all()
+    )
+    return [row._asdict() for row in rows]
+
+
+def dashboard_summary() -> dict[str, Any]:
+    """Global dashboard blocks: counts, announcements, grade and 30-day attendance charts."""
+    since = date.today() - timedelta(days=30)
+    return {
+        "counts": dashboard_cache.get("counts", _counts),
+        "announcements": dashboard_cache.get("announcements", _announcements),
+        "grade_stats": dashboard_cache.get("grade_stats", _grade_stats),
+        # Keyed by the window start so the chart rolls over at midnight.
+        "attendance_stats": dashboard_cache.get(("attendance_stats", since), lambda: _attendance_stats(since)),
+    }
+
+
+def user_blocks(user_id: int) -> dict[str, Any]:
+    return {
+        "todos": dashboard_cache.get(("todos", user_id), lambda: _todos(user_id)),
+        "messages": dashboard_cache.get(("messages", user_id), lambda: _messages(user_id)),
+    }
+
+
+BLOCKS_BY_MODEL: dict[Any, set[str]] = {}
+for _name, _models in GLOBAL_BLOCKS.items():
+    for _model in _models:
+        BLOCKS_BY_MODEL.setdefault(_model, set()).add(_name)
+BLOCKS_BY_TABLE = {model.__tablename__: blocks for model, blocks in BLOCKS_BY_MODEL.items()}
+BLOCKS_BY_TABLE.update({model.__tablename__: {name} for name, model in USER_BLOCKS.items()})
+
+
+def _pending(session) -> set[Hashable]:
+    return session.info.setdefault("dashboard_changes", set())
+
+
+def _record_change(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    changes = _pending(session)
+    changes.update(BLOCKS_BY_MODEL.get(type(target), ()))
+    for name, model in USER_BLOCKS.items():
+        if isinstance(target, model):
+            changes.add((name, target.user_id))
+
+
+for _model in {*BLOCKS_BY_MODEL, *USER_BLOCKS.values()}:
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event, _record_change)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_statement(orm_execute_state) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    blocks = BLOCKS_BY_TABLE.get(getattr(table, "name", None))
+    if blocks:
+        _pending(orm_execute_state.session).update(blocks)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session) -> None:
+    changes = session.info.pop("dashboard_changes", None)
+    if changes:
+        dashboard_cache.invalidate(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session) -> None:
+    session.info.pop("dashboard_changes", None)
@@ -0,0 +1,245 @@
+"""Credit-weighted averages, GPA and ranks, cached in ``student_gpa``.
+
+Ranks within a class and within a grade level depend on every peer, so the
+unit of computation (and of invalidation) is a cohort: one term and one
+``Classroom.grade_level``.  A cohort is computed with one query and a few
+NumPy passes in a transaction of its own, then written to ``student_gpa``
+with a ``student_gpa_cohorts`` marker (so a cohort without grades stays
+cached too); any grade write touching the cohort deletes both in the same
+transaction and the next read rebuilds them.  Only the ``GPA_ASSESSMENT_TYPE`` score of each course counts, and
+courses without credit are ignored.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .grade_aggregates import on_grade_change
+from .models import Classroom, Course, GradeRecord, Student, StudentGpaCohort, StudentTermGPA
+
+# (lowest score, grade points) on the common 4.0 scale; below 60 scores 0.
+GPA_SCALE = ((90, 4.0), (85, 3.7), (82, 3.3), (78, 3.0), (75, 2.7), (72, 2.3), (68, 2.0), (64, 1.5), (60, 1.0))
+_THRESHOLDS = np.array([low for low, _ in reversed(GPA_SCALE)], dtype=np.float64)
+_POINTS = np.array([0.0] + [points for _, points in reversed(GPA_SCALE)])
+
+
+def grade_points(scores: np.ndarray) -> np.ndarray:
+    return _POINTS[np.searchsorted(_THRESHOLDS, scores, side="right")]
+
+
+def competition_rank(groups: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Rank ``values`` (higher is better) within each group, ties sharing a rank ("1224").
+
+    Returns ``(ranks, group_sizes)`` aligned with the input.
+    """
+    order = np.lexsort((-values, groups))
+    sorted_groups, sorted_values = groups[order], values[order]
+    position = np.arange(order.size)
+    new_group = np.ones(order.size, dtype=bool)
+    new_group[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    group_start = np.maximum.accumulate(np.where(new_group, position, 0))
+    tie = np.zeros(order.size, dtype=bool)
+    tie[1:] = ~new_group[1:] & (sorted_values[1:] == sorted_values[:-1])
+    first_of_tie = np.maximum.accumulate(np.where(tie, 0, position))
+    ranks = np.empty(order.size, dtype=np.int64)
+    ranks[order] = first_of_tie - group_start + 1
+    _, inverse, sizes = np.unique(groups, return_inverse=True, return_counts=True)
+    return ranks, sizes[inverse]
+
+
+def _cohort_filter(grade_level: str):
+    if grade_level:
+        return Classroom.grade_level == grade_level
+    return Student.class_id.is_(None) | Classroom.grade_level.is_(None) | (Classroom.grade_level == "")
+
+
+def compute_cohort(term: str, grade_level: str) -> list[StudentTermGPA]:
+    """Recompute and store ``student_gpa`` rows for one term and grade level; return them detached.
+
+    Runs in its own transaction so a read request never commits its session.
+    The rows are returned rather than re-read because the caller's snapshot
+    (REPEATABLE READ on MySQL) may predate this commit.
+    """
+    assessment_type = current_app.config.get("GPA_ASSESSMENT_TYPE", "期末")
+    table = StudentTermGPA.__table__
+    cohorts = StudentGpaCohort.__table__
+    now = datetime.utcnow()
+    values = None
+    try:
+        with db.engine.begin() as connection:
+            rows = connection.execute(
+                select(GradeRecord.student_id, func.coalesce(Student.class_id, 0), GradeRecord.score, Course.credit)
+                .join(Student, Student.id == GradeRecord.student_id)
+                .outerjoin(Classroom, Classroom.id == Student.class_id)
+                .join(Course, Course.id == GradeRecord.course_id)
+                .where(
+                    GradeRecord.term == term,
+                    GradeRecord.assessment_type == assessment_type,
+                    Course.credit > 0,
+                    _cohort_filter(grade_level),
+                )
+            ).all()
+            values = _cohort_rows(term, grade_level, rows, now)
+            connection.execute(delete(table).where(table.c.term == term, table.c.grade_level == grade_level))
+            connection.execute(
+                delete(cohorts).where(cohorts.c.term == term, cohorts.c.grade_level == grade_level)
+            )
+            if values:
+                connection.execute(table.insert(), values)
+            # The marker keeps a cohort without qualifying grades cached too.
+            connection.execute(cohorts.insert().values(term=term, grade_level=grade_level, computed_at=now))
+    except IntegrityError:
+        # Another request computed the same cohort concurrently; keep its rows.
+        pass
+    except OperationalError:
+        # The request's own uncommitted writes can hold the lock (SQLite has
+        # a single writer); serve the rows uncached rather than fail the read.
+        if values is None:
+            raise
+        current_app.logger.warning("student_gpa cohort %s/%s not cached", term, grade_level, exc_info=True)
+    return [StudentTermGPA(**row) for row in values]
+
+
+def _cohort_rows(term: str, grade_level: str, rows, computed_at: datetime) -> list[dict]:
+    if not rows:
+        return []
+    student_ids, class_ids, scores, credits = (np.asarray(column) for column in zip(*rows))
+    scores, credits = scores.astype(np.float64), credits.astype(np.float64)
+    students, inverse = np.unique(student_ids, return_inverse=True)
+    total_credits = np.bincount(inverse, weights=credits)
+    averages = np.bincount(inverse, weights=credits * scores) / total_credits
+    gpas = np.bincount(inverse, weights=credits * grade_points(scores)) / total_credits
+    course_counts = np.bincount(inverse)
+    student_classes = np.zeros(students.size, dtype=np.int64)
+    student_classes[inverse] = class_ids
+
+    class_ranks, class_sizes = competition_rank(student_classes, averages)
+    grade_ranks, grade_sizes = competition_rank(np.zeros(students.size, dtype=np.int64), averages)
+    return [
+        {
+            "student_id": int(students[i]),
+            "term": term,
+            "class_id": int(student_classes[i]),
+            "grade_level": grade_level,
+            "course_count": int(course_counts[i]),
+            "credits": float(total_credits[i]),
+            "weighted_average": float(averages[i]),
+            "gpa": float(gpas[i]),
+            "class_rank": int(class_ranks[i]),
+            "class_size": int(class_sizes[i]),
+            "grade_rank": int(grade_ranks[i]),
+            "grade_size": int(grade_sizes[i]),
+            "computed_at": computed_at,
+        }
+        for i in range(students.size)
+    ]
+
+
+def _fresh_cohort(term: str, grade_level: str) -> list[StudentTermGPA] | None:
+    """``None`` when the cohort is cached in ``student_gpa``; otherwise compute it and return its rows."""
+    cached = (
+        db.session.query(StudentGpaCohort.id)
+        .filter(StudentGpaCohort.term == term, StudentGpaCohort.grade_level == grade_level)
+        .first()
+    )
+    return compute_cohort(term, grade_level) if cached is None else None
+
+
+def student_gpa(student: Student, term: str | None = None) -> list[StudentTermGPA]:
+    """Per-term GPA rows for ``student`` (every term with grades when ``term`` is omitted)."""
+    grade_level = (student.classroom.grade_level if student.classroom else None) or ""
+    if term:
+        terms = [term]
+    else:
+        terms = [
+            value
+            for (value,) in db.session.query(GradeRecord.term)
+            .filter(GradeRecord.student_id == student.id)
+            .distinct()
+            .order_by(GradeRecord.term.asc())
+        ]
+    results, cached_terms = [], []
+    for value in terms:
+        computed = _fresh_cohort(value, grade_level)
+        if computed is None:
+            cached_terms.append(value)
+        else:
+            results.extend(row for row in computed if row.student_id == student.id)
+    if cached_terms:
+        results.extend(
+            StudentTermGPA.query.filter(
+                StudentTermGPA.student_id == student.id, StudentTermGPA.term.in_(cached_terms)
+            ).all()
+        )
+    return sorted(results, key=lambda row: row.term)
+
+
+def class_ranking(
+    classroom: Classroom, term: str | None = None
+) -> tuple[str | None, list[tuple[StudentTermGPA, Student]]]:
+    """Return ``(term, [(gpa_row, student), ...])`` ordered by class rank; defaults to the latest term."""
+    if not term:
+        term = (
+            db.session.query(func.max(GradeRecord.term))
+            .join(Student, Student.id == GradeRecord.student_id)
+            .filter(Student.class_id == classroom.id)
+            .scalar()
+        )
+        if term is None:
+            return None, []
+    computed = _fresh_cohort(term, classroom.grade_level or "")
+    if computed is None:
+        rows = (
+            db.session.query(StudentTermGPA, Student)
+            .join(Student, Student.id == StudentTermGPA.student_id)
+            .filter(StudentTermGPA.class_id == classroom.id, StudentTermGPA.term == term)
+            .order_by(StudentTermGPA.class_rank.asc(), Student.student_number.asc())
+            .all()
+        )
+        return term, rows
+    members = [row for row in computed if row.class_id == classroom.id]
+    students = {
+        student.id: student
+        for student in Student.query.filter(Student.id.in_([row.student_id for row in members]))
+    }
+    rows = [(row, students[row.student_id]) for row in members if row.student_id in students]
+    rows.sort(key=lambda pair: (pair[0].class_rank, pair[1].student_number))
+    return term, rows
+
+
+@on_grade_change
+def _invalidate_cohorts(connection, keys) -> None:
+    terms_by_class: dict[int, set[str]] = {}
+    for class_id, _course_id, term, _assessment_type in keys:
+        terms_by_class.setdefault(class_id, set()).add(term)
+    levels = dict(
+        connection.execute(
+            select(Classroom.id, Classroom.grade_level).where(Classroom.id.in_(list(terms_by_class)))
+        ).all()
+    )
+    for class_id, terms in terms_by_class.items():
+        for table in (StudentGpaCohort.__table__, StudentTermGPA.__table__):
+            connection.execute(
+                delete(table).where(table.c.term.in_(terms), table.c.grade_level == (levels.get(class_id) or ""))
+            )
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_credit_or_level_change(session, flush_context) -> None:
+    # Credits and grade levels feed every cohort they appear in; such edits
+    # are rare, so drop the whole cache.
+    changed = any(
+        (isinstance(obj, Course) and inspect(obj).attrs.credit.history.has_changes())
+        or (isinstance(obj, Classroom) and inspect(obj).attrs.grade_level.history.has_changes())
+        for obj in session.dirty
+    )
+    if changed:
+        session.connection().execute(delete(StudentGpaCohort.__table__))
+        session.connection().execute(delete(StudentTermGPA.__table__))
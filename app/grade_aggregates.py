@@ -0,0 +1,344 @@
+"""Keeps ``grade_aggregates`` in step with ``grade_records``.
+
+Each rollup row holds count, sum, sum of squares, min and max of the scores
+for one (class, course, term, assessment type).  Writes add and remove
+values as deltas inside the transaction that changes the grades: unit of
+work writes are collected by mapper events and applied in an ``after_flush``
+hook, and the bulk paths in ``utils.upsert_grade_scores`` call
+:func:`apply_grade_deltas` themselves.
+Min and max cannot be decremented, so a bucket is recomputed from
+``grade_records`` when a removed score may have been its boundary.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable
+
+import click
+from flask import Flask
+from sqlalchemy import bindparam, case, delete, event, func, insert, inspect, or_, select, tuple_, update
+from sqlalchemy.orm import Session, object_session
+
+from .extensions import db
+from .models import GradeAggregate, GradeRecord, Student
+
+AggregateKey = tuple[int, int, str, str]  # (class_id or 0, course_id, term, assessment_type)
+
+KEY_COLUMNS = ("class_id", "course_id", "term", "assessment_type")
+
+# Called as ``listener(connection, keys)`` with every bucket a write touched,
+# inside the writing transaction; used by caches derived from grades.
+GRADE_CHANGE_LISTENERS: list[Callable] = []
+
+
+def on_grade_change(listener: Callable) -> Callable:
+    GRADE_CHANGE_LISTENERS.append(listener)
+    return listener
+
+
+class GradeDeltas:
+    def __init__(self) -> None:
+        self.added: dict[AggregateKey, list[float]] = defaultdict(list)
+        self.removed: dict[AggregateKey, list[float]] = defaultdict(list)
+        self.recompute: set[AggregateKey] = set()
+
+    def add(self, key: AggregateKey, score: float) -> None:
+        self.added[key].append(score)
+
+    def remove(self, key: AggregateKey, score: float) -> None:
+        self.removed[key].append(score)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.recompute)
+
+
+def aggregate_key(class_id: int | None, course_id: int, term: str, assessment_type: str) -> AggregateKey:
+    return (class_id or 0, course_id, term, assessment_type)
+
+
+def _insert_missing(connection, keys: list[AggregateKey]) -> None:
+    table = GradeAggregate.__table__
+    rows = [dict(zip(KEY_COLUMNS, key), score_count=0, score_sum=0, score_sum_sq=0) for key in keys]
+    if connection.dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(table)
+        stmt = stmt.on_duplicate_key_update(class_id=stmt.inserted.class_id)
+    elif connection.dialect.name in {"sqlite", "postgresql"}:
+        if connection.dialect.name == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=list(KEY_COLUMNS))
+    else:
+        existing = set(
+            connection.execute(select(*(table.c[name] for name in KEY_COLUMNS)).where(_keys_clause(keys))).all()
+        )
+        rows = [row for row, key in zip(rows, keys) if key not in existing]
+        stmt = insert(table)
+    if rows:
+        connection.execute(stmt, rows)
+
+
+def _keys_clause(keys):
+    table = GradeAggregate.__table__
+    return tuple_(*(table.c[name] for name in KEY_COLUMNS)).in_(keys)
+
+
+def _key_params(key: AggregateKey) -> dict:
+    return {f"k_{name}": value for name, value in zip(KEY_COLUMNS, key)}
+
+
+def _key_where(table):
+    return [table.c[name] == bindparam(f"k_{name}") for name in KEY_COLUMNS]
+
+
+def _recompute(connection, keys: set[AggregateKey]) -> None:
+    table = GradeAggregate.__table__
+    for key in keys:
+        class_id, course_id, term, assessment_type = key
+        row = connection.execute(
+            select(
+                func.count(GradeRecord.id),
+                func.sum(GradeRecord.score),
+                func.sum(GradeRecord.score * GradeRecord.score),
+                func.min(GradeRecord.score),
+                func.max(GradeRecord.score),
+            )
+            .join(Student, Student.id == GradeRecord.student_id)
+            .where(
+                GradeRecord.course_id == course_id,
+                GradeRecord.term == term,
+                GradeRecord.assessment_type == assessment_type,
+                Student.class_id.is_(None) if class_id == 0 else Student.class_id == class_id,
+            )
+        ).one()
+        where = [table.c[name] == value for name, value in zip(KEY_COLUMNS, key)]
+        if not row[0]:
+            connection.execute(delete(table).where(*where))
+            continue
+        _insert_missing(connection, [key])
+        connection.execute(
+            update(table)
+            .where(*where)
+            .values(
+                score_count=row[0],
+                score_sum=row[1],
+                score_sum_sq=row[2],
+                min_score=row[3],
+                max_score=row[4],
+                updated_at=datetime.utcnow(),
+            )
+        )
+
+
+def apply_grade_deltas(connection, deltas: GradeDeltas) -> None:
+    """Fold ``deltas`` into the rollup rows using ``connection`` (the writing transaction's)."""
+    if not deltas:
+        return
+    table = GradeAggregate.__table__
+    keys = sorted(set(deltas.added) | set(deltas.removed))
+    if keys:
+        _insert_missing(connection, keys)
+        min_param, max_param = bindparam("d_min"), bindparam("d_max")
+        stmt = (
+            update(table)
+            .where(*_key_where(table))
+            .values(
+                score_count=table.c.score_count + bindparam("d_count"),
+                score_sum=table.c.score_sum + bindparam("d_sum"),
+                score_sum_sq=table.c.score_sum_sq + bindparam("d_sum_sq"),
+                min_score=case(
+                    (min_param.is_(None), table.c.min_score),
+                    (or_(table.c.min_score.is_(None), table.c.min_score > min_param), min_param),
+                    else_=table.c.min_score,
+                ),
+                max_score=case(
+                    (max_param.is_(None), table.c.max_score),
+                    (or_(table.c.max_score.is_(None), table.c.max_score < max_param), max_param),
+                    else_=table.c.max_score,
+                ),
+                updated_at=datetime.utcnow(),
+            )
+        )
+        params = []
+        for key in keys:
+            added, removed = deltas.added.get(key, []), deltas.removed.get(key, [])
+            params.append(
+                {
+                    **_key_params(key),
+                    "d_count": len(added) - len(removed),
+                    "d_sum": sum(added) - sum(removed),
+                    "d_sum_sq": sum(v * v for v in added) - sum(v * v for v in removed),
+                    "d_min": min(added) if added else None,
+                    "d_max": max(added) if added else None,
+                }
+            )
+        connection.execute(stmt, params)
+
+    recompute = set(deltas.recompute)
+    removed_keys = [key for key in keys if deltas.removed.get(key)]
+    if removed_keys:
+        current = connection.execute(
+            select(
+                *(table.c[name] for name in KEY_COLUMNS), table.c.score_count, table.c.min_score, table.c.max_score
+            ).where(_keys_clause(removed_keys))
+        ).all()
+        for class_id, course_id, term, assessment_type, count, min_score, max_score in current:
+            key = (class_id, course_id, term, assessment_type)
+            removed = deltas.removed[key]
+            if count <= 0 or min(removed) <= (min_score or 0) or max(removed) >= (max_score or 0):
+                recompute.add(key)
+    _recompute(connection, recompute)
+
+    touched = set(keys) | set(deltas.recompute)
+    for listener in GRADE_CHANGE_LISTENERS:
+        listener(connection, touched)
+
+
+def _previous(state, attribute: str):
+    """Value ``attribute`` had before this flush (the columns involved are ``active_history``)."""
+    history = state.attrs[attribute].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.added:
+        return None  # changed from NULL
+    return getattr(state.object, attribute)
+
+
+def _class_id(connection, student_id: int):
+    return connection.execute(select(Student.class_id).where(Student.id == student_id)).scalar()
+
+
+def _pending(target) -> GradeDeltas | None:
+    session = object_session(target)
+    return session.info.setdefault("grade_deltas", GradeDeltas()) if session is not None else None
+
+
+# Mapper events rather than ``session.new``/``dirty``/``deleted``: they also
+# fire for rows removed by a delete-orphan cascade during the flush.
+@event.listens_for(GradeRecord, "after_insert")
+def _grade_inserted(mapper, connection, target) -> None:
+    deltas = _pending(target)
+    if deltas is not None:
+        class_id = _class_id(connection, target.student_id)
+        deltas.add(aggregate_key(class_id, target.course_id, target.term, target.assessment_type), target.score)
+
+
+@event.listens_for(GradeRecord, "after_update")
+def _grade_updated(mapper, connection, target) -> None:
+    deltas = _pending(target)
+    if deltas is None:
+        return
+    state = inspect(target)
+    old_key = aggregate_key(
+        _class_id(connection, _previous(state, "student_id")),
+        _previous(state, "course_id"),
+        _previous(state, "term"),
+        _previous(state, "assessment_type"),
+    )
+    new_key = aggregate_key(
+        _class_id(connection, target.student_id), target.course_id, target.term, target.assessment_type
+    )
+    old_score = _previous(state, "score")
+    if old_key != new_key or old_score != target.score:
+        deltas.remove(old_key, old_score)
+        deltas.add(new_key, target.score)
+
+
+@event.listens_for(GradeRecord, "before_delete")
+def _grade_deleted(mapper, connection, target) -> None:
+    # Before the DELETE, so the student row (deleted later in the same flush) is still there.
+    deltas = _pending(target)
+    if deltas is None:
+        return
+    state = inspect(target)
+    key = aggregate_key(
+        _class_id(connection, _previous(state, "student_id")),
+        _previous(state, "course_id"),
+        _previous(state, "term"),
+        _previous(state, "assessment_type"),
+    )
+    deltas.remove(key, _previous(state, "score"))
+
+
+@event.listens_for(Student, "after_update")
+def _student_moved(mapper, connection, target) -> None:
+    # Students are written before their grades, so grade events later in
+    # this flush already see the new class.
+    if not inspect(target).attrs.class_id.history.has_changes():
+        return
+    old_class = _previous(inspect(target), "class_id")
+    deltas = _pending(target)
+    if deltas is None or old_class == target.class_id:
+        return
+    grades = connection.execute(
+        select(GradeRecord.course_id, GradeRecord.term, GradeRecord.assessment_type, GradeRecord.score).where(
+            GradeRecord.student_id == target.id
+        )
+    ).all()
+    for course_id, term, assessment_type, score in grades:
+        deltas.remove(aggregate_key(old_class, course_id, term, assessment_type), score)
+        deltas.add(aggregate_key(target.class_id, course_id, term, assessment_type), score)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_pending_deltas(session, flush_context) -> None:
+    deltas = session.info.pop("grade_deltas", None)
+    if deltas:
+        apply_grade_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending_deltas(session, previous_transaction) -> None:
+    session.info.pop("grade_deltas", None)
+
+
+def rebuild_grade_aggregates() -> int:
+    """Recompute every rollup row from ``grade_records``; return the number of rows written."""
+    table = GradeAggregate.__table__
+    class_id = func.coalesce(Student.class_id, 0)
+    source = (
+        select(
+            class_id,
+            GradeRecord.course_id,
+            GradeRecord.term,
+            GradeRecord.assessment_type,
+            func.count(GradeRecord.id),
+            func.sum(GradeRecord.score),
+            func.sum(GradeRecord.score * GradeRecord.score),
+            func.min(GradeRecord.score),
+            func.max(GradeRecord.score),
+            func.now(),
+        )
+        .join(Student, Student.id == GradeRecord.student_id)
+        .group_by(class_id, GradeRecord.course_id, GradeRecord.term, GradeRecord.assessment_type)
+    )
+    db.session.execute(delete(table))
+    db.session.execute(
+        insert(table).from_select(
+            [
+                *KEY_COLUMNS,
+                "score_count",
+                "score_sum",
+                "score_sum_sq",
+                "min_score",
+                "max_score",
+                "updated_at",
+            ],
+            source,
+        )
+    )
+    db.session.commit()
+    return db.session.query(func.count(GradeAggregate.id)).scalar() or 0
+
+
+def init_app(app: Flask) -> None:
+    @app.cli.command("rebuild-grade-aggregates")
+    def rebuild_command() -> None:
+        """Backfill grade_aggregates from grade_records."""
+        rows = rebuild_grade_aggregates()
+        click.echo(f"rebuilt {rows} grade aggregate rows")
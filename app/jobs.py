@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+
+import click
+from flask import Flask, current_app
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import OperationalError
+
+from .extensions import db
+from .models import Job
+
+
+class JobSpec(NamedTuple):
+    handler: Callable[["JobContext"], dict[str, Any] | None]
+    permission: str | None
+    submittable: bool  # may be submitted with client-supplied params through POST /jobs/
+
+
+JOB_HANDLERS: dict[str, JobSpec] = {}
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler once cancellation of its job has been requested."""
+
+
+def job_handler(kind: str, permission: str | None = None, submittable: bool = True) -> Callable:
+    def decorator(func: Callable) -> Callable:
+        JOB_HANDLERS[kind] = JobSpec(func, permission, submittable)
+        return func
+
+    return decorator
+
+
+class JobContext:
+    """Handed to job handlers: parameters, progress reporting, cancellation and the result file."""
+
+    def __init__(self, job_id: int, params: dict[str, Any], result_dir: Path, user_id: int | None = None) -> None:
+        self.job_id = job_id
+        self.params = params
+        self.user_id = user_id
+        self.result_dir = result_dir
+        self.result_file: Path | None = None
+
+    def _execute(self, statement):
+        # Status writes use their own connection so they never commit the
+        # handler's unit of work.  On SQLite a long-running read can hold the
+        # database lock; progress is best effort there.
+        try:
+            with db.engine.begin() as connection:
+                return connection.execute(statement)
+        except OperationalError:
+            current_app.logger.debug("job %s: status update skipped", self.job_id)
+            return None
+
+    def update(self, progress: int | None = None, message: str | None = None) -> None:
+        values: dict[str, Any] = {}
+        if progress is not None:
+            values["progress"] = max(0, min(int(progress), 99))
+        if message is not None:
+            values["message"] = message[:255]
+        if values:
+            self._execute(update(Job).where(Job.id == self.job_id).values(**values))
+
+    def check_cancelled(self) -> None:
+        result = self._execute(select(Job.cancel_requested).where(Job.id == self.job_id))
+        if result is not None and result.scalar():
+            raise JobCancelled()
+
+    def track(self, items: Iterable[Any], total: int | None = None, every: int = 1000) -> Iterator[Any]:
+        """Yield ``items``, reporting progress and checking cancellation every ``every`` items."""
+        for count, item in enumerate(items, start=1):
+            yield item
+            if count % every == 0:
+                self.check_cancelled()
+                self.update(progress=count * 100 // total if total else None, message=f"已处理 {count} 行")
+
+    def result_path(self, filename: str) -> Path:
+        self.result_dir.mkdir(parents=True, exist_ok=True)
+        self.result_file = self.result_dir / filename
+        return self.result_file
+
+
+class JobRunner:
+    """Bounded thread pool that claims ``pending`` jobs from the database and runs them."""
+
+    def __init__(self, app: Flask) -> None:
+        self.app = app
+        self.max_workers = app.config.get("JOB_MAX_WORKERS", 2)
+        self._executor: ThreadPoolExecutor | None = None
+        self._inflight: set[int] = set()
+        self._lock = threading.Lock()
+        self._poller: threading.Thread | None = None
+        self._last_heartbeat = float("-inf")
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            return self._executor
+
+    def dispatch(self, job_id: int) -> None:
+        with self._lock:
+            if job_id in self._inflight:
+                return
+            self._inflight.add(job_id)
+        self.executor.submit(self._run, job_id)
+
+    def _run(self, job_id: int) -> None:
+        try:
+            with self.app.app_context():
+                self._execute(job_id)
+        finally:
+            with self._lock:
+                self._inflight.discard(job_id)
+
+    def _execute(self, job_id: int) -> None:
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "pending")
+            .values(status="running", started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            return
+
+        job = db.session.get(Job, job_id)
+        spec = JOB_HANDLERS.get(job.kind)
+        context = JobContext(
+            job_id,
+            json.loads(job.params) if job.params else {},
+            Path(self.app.config["JOB_RESULT_FOLDER"]) / str(job_id),
+            job.created_by,
+        )
+        values: dict[str, Any] = {}
+        try:
+            if spec is None:
+                raise ValueError(f"未知的任务类型: {job.kind}")
+            result = spec.handler(context)
+        except JobCancelled:
+            db.session.rollback()
+            values.update(status="cancelled", message="任务已取消")
+        except Exception as exc:  # noqa: BLE001 - any handler failure is recorded on the job
+            db.session.rollback()
+            current_app.logger.exception("job %s (%s) failed", job_id, job.kind)
+            values.update(status="failed", message=str(exc)[:255] or exc.__class__.__name__)
+        else:
+            values.update(status="succeeded", progress=100, message="已完成")
+            if result is not None:
+                values["result"] = json.dumps(result, ensure_ascii=False, default=str)
+            if context.result_file is not None:
+                values.update(result_path=str(context.result_file), result_name=context.result_file.name)
+        values["finished_at"] = datetime.utcnow()
+        db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+        db.session.commit()
+        db.session.remove()
+
+    def heartbeat(self) -> None:
+        """Stamp this process's running jobs and fail ``running`` jobs nobody has stamped lately.
+
+        A job left ``running`` by a crashed or restarted process stops
+        getting heartbeats and is failed ``JOB_STALE_AFTER`` seconds later.
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            inflight = set(self._inflight)
+        with db.engine.begin() as connection:
+            if inflight:
+                connection.execute(update(Job).where(Job.id.in_(inflight)).values(heartbeat_at=now))
+            stale_before = now - timedelta(seconds=self.app.config.get("JOB_STALE_AFTER", 120))
+            query = update(Job).where(
+                Job.status == "running", func.coalesce(Job.heartbeat_at, Job.started_at) < stale_before
+            )
+            if inflight:
+                query = query.where(Job.id.not_in(inflight))
+            connection.execute(query.values(status="failed", message="任务中断：执行进程已退出", finished_at=now))
+
+    def poll_once(self) -> None:
+        """Heartbeat when due, then dispatch ``pending`` jobs into the free worker slots."""
+        with self.app.app_context():
+            now = time.monotonic()
+            if now - self._last_heartbeat >= self.app.config.get("JOB_HEARTBEAT_INTERVAL", 30):
+                self._last_heartbeat = now
+                self.heartbeat()
+            with self._lock:
+                free_slots = self.max_workers - len(self._inflight)
+                inflight = set(self._inflight)
+            job_ids = []
+            if free_slots > 0:
+                query = select(Job.id).where(Job.status == "pending")
+                if inflight:
+                    query = query.where(Job.id.not_in(inflight))
+                job_ids = db.session.scalars(query.order_by(Job.id.asc()).limit(free_slots)).all()
+            db.session.remove()
+        for job_id in job_ids:
+            self.dispatch(job_id)
+
+    def poll_forever(self, interval: float = 1.0) -> None:
+        while True:
+            try:
+                self.poll_once()
+            except OperationalError:
+                self.app.logger.warning("job poll failed; retrying", exc_info=True)
+            time.sleep(interval)
+
+    def ensure_poller(self, interval: float = 1.0) -> None:
+        """Start :meth:`poll_forever` in a daemon thread (``JOB_RUNNER = "thread"``)."""
+        if self._poller is not None:
+            return
+        with self._lock:
+            if self._poller is None:
+                self._poller = threading.Thread(
+                    target=self.poll_forever, args=(interval,), name="job-poller", daemon=True
+                )
+                self._poller.start()
+
+
+def get_job_runner() -> JobRunner:
+    return current_app.extensions["job_runner"]
+
+
+def submit_job(kind: str, params: dict[str, Any], user_id: int | None) -> Job:
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"未知的任务类型: {kind}")
+    active = (
+        db.session.query(func.count(Job.id)).filter(Job.status.in_(("pending", "running"))).scalar() or 0
+    )
+    if active >= current_app.config.get("JOB_MAX_PENDING", 20):
+        raise ValueError("后台任务过多，请稍后再试")
+    job = Job(kind=kind, params=json.dumps(params, ensure_ascii=False), created_by=user_id)
+    db.session.add(job)
+    db.session.commit()
+    if current_app.config.get("JOB_RUNNER", "thread") == "thread":
+        get_job_runner().dispatch(job.id)
+    return job
+
+
+def cancel_job(job: Job) -> None:
+    if job.is_finished:
+        return
+    job.cancel_requested = True
+    if job.status == "pending":
+        job.status = "cancelled"
+        job.message = "任务已取消"
+        job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def init_app(app: Flask) -> None:
+    runner = JobRunner(app)
+    app.extensions["job_runner"] = runner
+
+    if app.config.get("JOB_RUNNER", "thread") == "thread":
+
+        @app.before_request
+        def start_job_poller() -> None:
+            # Started by the first request rather than at import so CLI
+            # commands never pick up jobs.  Its first pass recovers jobs
+            # left behind by a previous process and dispatches pending ones.
+            runner.ensure_poller()
+
+    @app.cli.command("worker")
+    @click.option("--interval", default=1.0, show_default=True, help="轮询间隔（秒）")
+    def worker(interval: float) -> None:
+        """Run background jobs from the jobs table until interrupted."""
+        runner = JobRunner(app)
+        click.echo(f"job worker started with {runner.max_workers} threads")
+        runner.poll_forever(interval)
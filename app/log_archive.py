@@ -0,0 +1,230 @@
+"""Cold storage for ``operation_logs`` and the explorer that reads across it.
+
+``flask archive-logs --older-than DAYS`` moves rows older than the cutoff
+into ``LOG_ARCHIVE_FOLDER/operation_logs-YYYY-MM.ndjson.gz``: one batch at a
+time it appends a gzip member to each month's file and only then deletes the
+batch, so an interrupted run at worst writes a batch twice (readers drop
+duplicate ids).  :func:`explore_logs` pages over the table and the archive as
+one sequence ordered by ``(created_at, id)``.
+"""
+
+from __future__ import annotations
+
+import gzip
+import heapq
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterator
+
+import click
+from flask import Flask, current_app
+from sqlalchemy import delete, select
+
+from .extensions import db
+from .models import OperationLog
+from .operation_log import get_log_writer
+from .utils import KeysetPage, _json_default, _seek_condition, decode_cursor, encode_cursor
+
+LOG_COLUMNS = ("id", "user_id", "action", "resource", "description", "ip_address", "created_at")
+ARCHIVE_NAME = re.compile(r"^operation_logs-(\d{4})-(\d{2})\.ndjson\.gz$")
+
+
+@dataclass
+class LogFilters:
+    user_id: int | None = None
+    action: str | None = None
+    resource: str | None = None
+    start: datetime | None = None  # inclusive
+    end: datetime | None = None  # exclusive
+
+    def matches(self, row: dict[str, Any]) -> bool:
+        if self.user_id is not None and row["user_id"] != self.user_id:
+            return False
+        if self.action and row["action"] != self.action:
+            return False
+        if self.resource and row["resource"] != self.resource:
+            return False
+        if self.start is not None and row["created_at"] < self.start:
+            return False
+        if self.end is not None and row["created_at"] >= self.end:
+            return False
+        return True
+
+
+def archive_folder() -> Path:
+    return Path(current_app.config["LOG_ARCHIVE_FOLDER"])
+
+
+def _month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def _next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def archive_months() -> list[tuple[datetime, Path]]:
+    """Return ``(month_start, path)`` for every archive file, oldest first."""
+    folder = archive_folder()
+    if not folder.is_dir():
+        return []
+    months = []
+    for path in folder.iterdir():
+        match = ARCHIVE_NAME.match(path.name)
+        if match:
+            months.append((datetime(int(match.group(1)), int(match.group(2)), 1), path))
+    return sorted(months)
+
+
+def read_archive(path: Path) -> Iterator[dict[str, Any]]:
+    seen: set[int] = set()
+    with gzip.open(path, "rt", encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if row["id"] in seen:
+                continue
+            seen.add(row["id"])
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+            yield row
+
+
+def archive_logs(older_than: datetime, batch_size: int | None = None) -> tuple[int, set[Path]]:
+    """Move rows created before ``older_than`` into the monthly archive files."""
+    batch_size = batch_size or current_app.config.get("LOG_ARCHIVE_BATCH_SIZE", 5000)
+    folder = archive_folder()
+    folder.mkdir(parents=True, exist_ok=True)
+    table = OperationLog.__table__
+    columns = [table.c[name] for name in LOG_COLUMNS]
+    moved = 0
+    touched: set[Path] = set()
+    while True:
+        # Each batch is deleted before the next is read, so "the oldest rows
+        # left" walks the created_at index without a seek cursor.
+        rows = [
+            dict(row._mapping)
+            for row in db.session.execute(
+                select(*columns)
+                .where(table.c.created_at < older_than)
+                .order_by(table.c.created_at, table.c.id)
+                .limit(batch_size)
+            )
+        ]
+        if not rows:
+            break
+        by_month: dict[datetime, list[dict[str, Any]]] = {}
+        for row in rows:
+            by_month.setdefault(_month_start(row["created_at"]), []).append(row)
+        for month, month_rows in by_month.items():
+            path = folder / f"operation_logs-{month:%Y-%m}.ndjson.gz"
+            with gzip.open(path, "at", encoding="utf-8") as handle:
+                for row in month_rows:
+                    handle.write(json.dumps(row, ensure_ascii=False, default=_json_default) + "\n")
+            touched.add(path)
+        db.session.execute(delete(table).where(table.c.id.in_([row["id"] for row in rows])))
+        db.session.commit()
+        moved += len(rows)
+    return moved, touched
+
+
+def _sort_key(row: dict[str, Any]) -> tuple[datetime, int]:
+    return row["created_at"], row["id"]
+
+
+def _database_page(filters: LogFilters, seek: list[Any] | None, ascending: bool, limit: int) -> list[dict[str, Any]]:
+    table = OperationLog.__table__
+    sort_columns = [table.c.created_at, table.c.id]
+    stmt = select(*(table.c[name] for name in LOG_COLUMNS))
+    if filters.user_id is not None:
+        stmt = stmt.where(table.c.user_id == filters.user_id)
+    if filters.action:
+        stmt = stmt.where(table.c.action == filters.action)
+    if filters.resource:
+        stmt = stmt.where(table.c.resource == filters.resource)
+    if filters.start is not None:
+        stmt = stmt.where(table.c.created_at >= filters.start)
+    if filters.end is not None:
+        stmt = stmt.where(table.c.created_at < filters.end)
+    if seek is not None:
+        stmt = stmt.where(_seek_condition(sort_columns, seek, greater=ascending))
+    stmt = stmt.order_by(*(column.asc() if ascending else column.desc() for column in sort_columns)).limit(limit)
+    return [dict(row._mapping, archived=False) for row in db.session.execute(stmt)]
+
+
+def _archive_page(
+    filters: LogFilters, seek: list[Any] | None, ascending: bool, limit: int, bound: tuple | None
+) -> list[dict[str, Any]]:
+    """Best ``limit`` archived rows past ``seek``; months that cannot beat ``bound`` are not opened."""
+    seek_key = tuple(seek) if seek is not None else None
+    months = archive_months()
+    if not ascending:
+        months.reverse()
+    picked: list[dict[str, Any]] = []
+    for month, path in months:
+        month_end = _next_month(month)
+        if filters.start is not None and month_end <= filters.start:
+            continue
+        if filters.end is not None and month >= filters.end:
+            continue
+        if seek_key is not None and (month_end <= seek_key[0] if ascending else month > seek_key[0]):
+            continue
+        # Months are visited in sort order, so once enough rows are picked
+        # (or the database already has better ones) later months cannot help.
+        worst = _sort_key(picked[-1]) if len(picked) >= limit else bound
+        if worst is not None and (month > worst[0] if ascending else month_end <= worst[0]):
+            break
+        candidates = (
+            dict(row, archived=True)
+            for row in read_archive(path)
+            if filters.matches(row)
+            and (seek_key is None or (_sort_key(row) > seek_key if ascending else _sort_key(row) < seek_key))
+        )
+        best = (heapq.nsmallest if ascending else heapq.nlargest)(limit, candidates, key=_sort_key)
+        picked = sorted(picked + best, key=_sort_key, reverse=not ascending)[:limit]
+    return picked
+
+
+def explore_logs(filters: LogFilters, cursor: str | None = None, per_page: int = 50) -> KeysetPage:
+    """Newest-first keyset page over live and archived logs, merged on ``(created_at, id)``."""
+    decoded = decode_cursor(cursor)
+    backwards = decoded is not None and decoded[0] == "prev"
+    ascending = backwards
+    seek = decoded[1] if decoded is not None else None
+
+    rows = _database_page(filters, seek, ascending, per_page + 1)
+    bound = _sort_key(rows[-1]) if len(rows) > per_page else None
+    archived = _archive_page(filters, seek, ascending, per_page + 1, bound)
+    if archived:
+        rows = sorted(rows + archived, key=_sort_key, reverse=not ascending)[: per_page + 1]
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = decoded is not None if backwards else has_more
+    has_prev = has_more if backwards else decoded is not None
+    return KeysetPage(
+        items=rows,
+        total=None,
+        total_is_estimate=False,
+        next_cursor=encode_cursor("next", list(_sort_key(rows[-1]))) if rows and has_next else None,
+        prev_cursor=encode_cursor("prev", list(_sort_key(rows[0]))) if rows and has_prev else None,
+    )
+
+
+def init_app(app: Flask) -> None:
+    @app.cli.command("archive-logs")
+    @click.option("--older-than", "days", type=int, required=True, help="归档多少天以前的日志")
+    @click.option("--batch-size", type=int, default=None, help="每批迁移的行数")
+    def archive_command(days: int, batch_size: int | None) -> None:
+        """Move old operation logs into monthly gzip NDJSON files."""
+        if days < 0:
+            raise click.BadParameter("天数不能为负数", param_hint="--older-than")
+        get_log_writer().flush()
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        moved, paths = archive_logs(cutoff, batch_size)
+        click.echo(f"archived {moved} log rows older than {cutoff:%Y-%m-%d %H:%M} into {len(paths)} files")
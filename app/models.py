@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import json
+import threading
+import time as _time
 from datetime import date, datetime, time
 from typing import Any
 
+from flask import current_app
 from flask_login import UserMixin
+from sqlalchemy.orm import Session, object_session
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from .extensions import db, login_manager
@@ -92,11 +97,105 @@ class User(UserMixin, db.Model):
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
 
+    def _access(self) -> tuple[frozenset[str], frozenset[str]]:
+        """Return ``(role_names, permission_codes)``, resolved at most once per request."""
+        if self.id is None:
+            roles = frozenset(role.name for role in self.roles)
+            codes = frozenset(perm.code for role in self.roles for perm in role.permissions)
+            return roles, codes
+        version = permission_cache.version
+        cached = self.__dict__.get("_access_cache")
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+        roles, codes = permission_cache.get(self.id)
+        self._access_cache = (version, roles, codes)
+        return roles, codes
+
+    @property
+    def role_names(self) -> frozenset[str]:
+        return self._access()[0]
+
+    @property
+    def permission_codes(self) -> frozenset[str]:
+        return self._access()[1]
+
     def has_role(self, role_name: str) -> bool:
-        return any(role.name == role_name for role in self.roles)
+        return role_name in self.role_names
 
     def has_permission(self, code: str) -> bool:
-        return any(role.has_permission(code) for role in self.roles)
+        return code in self.permission_codes
+
+
+class PermissionCache:
+    """Process-wide cache of role names and permission codes keyed by user id.
+
+    Entries are stamped with ``version``; any change to user roles or role
+    permissions bumps the version so stale entries are ignored.  A short TTL
+    (``PERMISSION_CACHE_TTL``) bounds staleness across worker processes.
+    """
+
+    def __init__(self) -> None:
+        self.version = 0
+        self._entries: dict[int, tuple[int, float, frozenset[str], frozenset[str]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> tuple[frozenset[str], frozenset[str]]:
+        version = self.version
+        entry = self._entries.get(user_id)
+        now = _time.monotonic()
+        if entry is not None and entry[0] == version and entry[1] > now:
+            return entry[2], entry[3]
+
+        rows = (
+            db.session.query(Role.name, Permission.code)
+            .select_from(user_roles)
+            .join(Role, Role.id == user_roles.c.role_id)
+            .outerjoin(role_permissions, role_permissions.c.role_id == Role.id)
+            .outerjoin(Permission, Permission.id == role_permissions.c.permission_id)
+            .filter(user_roles.c.user_id == user_id)
+            .all()
+        )
+        roles = frozenset(role_name for role_name, _ in rows)
+        codes = frozenset(code for _, code in rows if code)
+        ttl = current_app.config.get("PERMISSION_CACHE_TTL", 60)
+        with self._lock:
+            if version == self.version:
+                self._entries[user_id] = (version, now + ttl, roles, codes)
+        return roles, codes
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+
+permission_cache = PermissionCache()
+
+
+def _mark_permissions_changed(target, *args) -> None:
+    session = object_session(target)
+    if session is None:
+        permission_cache.invalidate()
+    else:
+        session.info["permissions_changed"] = True
+
+
+for _collection in (User.roles, Role.permissions):
+    db.event.listen(_collection, "append", _mark_permissions_changed)
+    db.event.listen(_collection, "remove", _mark_permissions_changed)
+for _model in (Role, Permission):
+    db.event.listen(_model, "after_delete", lambda mapper, connection, target: _mark_permissions_changed(target))
+
+
+@db.event.listens_for(Session, "after_commit")
+def _invalidate_permissions_after_commit(session) -> None:
+    if session.info.pop("permissions_changed", False):
+        permission_cache.invalidate()
+
+
+@db.event.listens_for(Session, "after_rollback")
+def _discard_permission_changes(session) -> None:
+    session.info.pop("permissions_changed", None)
 
 
 @login_manager.user_loader
@@ -122,6 +221,17 @@ class Classroom(db.Model):
 
 class Student(db.Model):
     __tablename__ = "students"
+    __table_args__ = (
+        # Keyword search index (see app/search.py); SQLite uses an FTS5 table instead.
+        db.Index(
+            "ft_students_search",
+            "student_number",
+            "name",
+            "email",
+            mysql_prefix="FULLTEXT",
+            mysql_with_parser="ngram",
+        ).ddl_if(dialect="mysql"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
@@ -129,7 +239,8 @@ class Student(db.Model):
     name = db.Column(db.String(100), nullable=False)
     gender = db.Column(db.String(10), nullable=False)
     date_of_birth = db.Column(db.Date, nullable=False)
-    class_id = db.Column(db.Integer, db.ForeignKey("classrooms.id"))
+    # active_history: the grade and attendance rollups move a student's rows to the new class.
+    class_id = db.mapped_column(db.Integer, db.ForeignKey("classrooms.id"), active_history=True)
     email = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(20), nullable=False)
     address = db.Column(db.String(255))
@@ -183,6 +294,9 @@ class Teacher(db.Model):
 
 class Course(db.Model):
     __tablename__ = "courses"
+    __table_args__ = (
+        db.Index("ft_courses_name", "name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram").ddl_if(dialect="mysql"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.String(20), unique=True, nullable=False)
@@ -217,36 +331,157 @@ class CourseSchedule(db.Model):
 
 class GradeRecord(db.Model):
     __tablename__ = "grade_records"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "student_id", "course_id", "term", "assessment_type", name="uq_grade_records_natural_key"
+        ),
+        db.Index("ix_grade_records_course_term", "course_id", "term", "assessment_type"),
+        db.Index("ix_grade_records_recorded_at", "recorded_at", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), nullable=False)
-    term = db.Column(db.String(20), nullable=False)
-    assessment_type = db.Column(db.String(50), nullable=False)
-    score = db.Column(db.Float, nullable=False)
+    # active_history: the grade_aggregates tracker needs the old values of edited rows.
+    student_id = db.mapped_column(db.Integer, db.ForeignKey("students.id"), nullable=False, active_history=True)
+    course_id = db.mapped_column(db.Integer, db.ForeignKey("courses.id"), nullable=False, active_history=True)
+    term = db.mapped_column(db.String(20), nullable=False, active_history=True)
+    assessment_type = db.mapped_column(db.String(50), nullable=False, active_history=True)
+    score = db.mapped_column(db.Float, nullable=False, active_history=True)
     remark = db.Column(db.String(255))
-    recorded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    recorded_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     student = db.relationship("Student", back_populates="grades")
     course = db.relationship("Course", back_populates="grades")
 
 
+class GradeAggregate(db.Model):
+    """Rollup of grade_records per class/course/term/assessment, maintained by app/grade_aggregates.py."""
+
+    __tablename__ = "grade_aggregates"
+    __table_args__ = (
+        db.UniqueConstraint("class_id", "course_id", "term", "assessment_type", name="uq_grade_aggregates_key"),
+        db.Index("ix_grade_aggregates_course", "course_id", "term"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    class_id = db.Column(db.Integer, nullable=False, default=0)  # 0: students without a class
+    course_id = db.Column(db.Integer, nullable=False)
+    term = db.Column(db.String(20), nullable=False)
+    assessment_type = db.Column(db.String(50), nullable=False)
+    score_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Double, nullable=False, default=0)
+    score_sum_sq = db.Column(db.Double, nullable=False, default=0)
+    min_score = db.Column(db.Float)
+    max_score = db.Column(db.Float)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def average(self) -> float:
+        return self.score_sum / self.score_count if self.score_count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        if not self.score_count:
+            return 0.0
+        variance = self.score_sum_sq / self.score_count - self.average**2
+        return max(variance, 0.0) ** 0.5
+
+
+class StudentTermGPA(db.Model):
+    """Cached GPA and ranks per student and term, recomputed per grade-level cohort by app/gpa.py."""
+
+    __tablename__ = "student_gpa"
+    __table_args__ = (
+        db.UniqueConstraint("student_id", "term", name="uq_student_gpa_student_term"),
+        db.Index("ix_student_gpa_cohort", "term", "grade_level"),
+        db.Index("ix_student_gpa_class_rank", "class_id", "term", "class_rank"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, nullable=False)
+    term = db.Column(db.String(20), nullable=False)
+    class_id = db.Column(db.Integer, nullable=False, default=0)  # 0: students without a class
+    grade_level = db.Column(db.String(20), nullable=False, default="")
+    course_count = db.Column(db.Integer, nullable=False, default=0)
+    credits = db.Column(db.Float, nullable=False, default=0)
+    weighted_average = db.Column(db.Float, nullable=False, default=0)
+    gpa = db.Column(db.Float, nullable=False, default=0)
+    class_rank = db.Column(db.Integer)
+    class_size = db.Column(db.Integer)
+    grade_rank = db.Column(db.Integer)
+    grade_size = db.Column(db.Integer)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "student_id": self.student_id,
+            "term": self.term,
+            "class_id": self.class_id or None,
+            "grade_level": self.grade_level or None,
+            "course_count": self.course_count,
+            "credits": self.credits,
+            "weighted_average": round(self.weighted_average, 2),
+            "gpa": round(self.gpa, 2),
+            "class_rank": self.class_rank,
+            "class_size": self.class_size,
+            "grade_rank": self.grade_rank,
+            "grade_size": self.grade_size,
+        }
+
+
+class StudentGpaCohort(db.Model):
+    """Marks a (term, grade level) cohort whose ``student_gpa`` rows are current, including cohorts with none."""
+
+    __tablename__ = "student_gpa_cohorts"
+    __table_args__ = (db.UniqueConstraint("term", "grade_level", name="uq_student_gpa_cohorts_key"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(20), nullable=False)
+    grade_level = db.Column(db.String(20), nullable=False, default="")
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class AttendanceRecord(db.Model):
     __tablename__ = "attendance_records"
+    __table_args__ = (
+        db.UniqueConstraint("student_id", "course_key", "record_date", name="uq_attendance_records_natural_key"),
+        db.Index("ix_attendance_records_course_date", "course_id", "record_date"),
+        db.Index("ix_attendance_records_record_date", "record_date", "status"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"))
-    record_date = db.Column(db.Date, nullable=False, default=date.today)
-    status = db.Column(db.String(20), nullable=False)  # Present/Absent/Leave
+    # active_history: the attendance_daily tracker needs the old values of edited rows.
+    student_id = db.mapped_column(db.Integer, db.ForeignKey("students.id"), nullable=False, active_history=True)
+    course_id = db.mapped_column(db.Integer, db.ForeignKey("courses.id"), active_history=True)
+    # Non-null stand-in for course_id in the natural key: unique keys treat NULLs
+    # as distinct, so roll calls without a course would never collide.
+    course_key = db.Column(db.Integer, db.Computed("coalesce(course_id, 0)", persisted=False), nullable=False)
+    record_date = db.mapped_column(db.Date, nullable=False, default=date.today, active_history=True)
+    status = db.mapped_column(db.String(20), nullable=False, active_history=True)  # Present/Absent/Leave
     remarks = db.Column(db.String(255))
 
     student = db.relationship("Student", back_populates="attendance_records")
     course = db.relationship("Course", back_populates="attendance_records")
 
 
+class AttendanceDaily(db.Model):
+    """Per-day attendance counts by class/course/status, maintained by app/attendance_rollup.py."""
+
+    __tablename__ = "attendance_daily"
+    __table_args__ = (
+        db.UniqueConstraint("record_date", "class_id", "course_id", "status", name="uq_attendance_daily_key"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    record_date = db.Column(db.Date, nullable=False)
+    class_id = db.Column(db.Integer, nullable=False, default=0)  # 0: students without a class
+    course_id = db.Column(db.Integer, nullable=False, default=0)  # 0: attendance not tied to a course
+    status = db.Column(db.String(20), nullable=False)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+
+
 class LeaveRequest(db.Model):
     __tablename__ = "leave_requests"
+    __table_args__ = (db.Index("ix_leave_requests_created_at", "created_at", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
@@ -279,6 +514,7 @@ class Announcement(db.Model):
 
 class TodoItem(db.Model):
     __tablename__ = "todo_items"
+    __table_args__ = (db.Index("ix_todo_items_user_status_due", "user_id", "is_completed", "due_date"),)
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -292,6 +528,7 @@ class TodoItem(db.Model):
 
 class SystemMessage(db.Model):
     __tablename__ = "system_messages"
+    __table_args__ = (db.Index("ix_system_messages_user_read", "user_id", "is_read", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -311,6 +548,16 @@ class SystemSetting(db.Model):
     description = db.Column(db.String(255))
 
 
+class TableVersion(db.Model):
+    """Change counter per table, bumped in the writing transaction (see app/table_versions.py)."""
+
+    __tablename__ = "table_versions"
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
 class DataBackup(db.Model):
     __tablename__ = "data_backups"
 
@@ -325,6 +572,7 @@ class DataBackup(db.Model):
 
 class OperationLog(db.Model):
     __tablename__ = "operation_logs"
+    __table_args__ = (db.Index("ix_operation_logs_created_at", "created_at", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
@@ -337,6 +585,46 @@ class OperationLog(db.Model):
     user = db.relationship("User", back_populates="logs")
 
 
+class Job(db.Model):
+    __tablename__ = "jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pending", index=True)  # pending/running/succeeded/failed/cancelled
+    params = db.Column(db.Text)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.String(255))
+    result = db.Column(db.Text)
+    result_path = db.Column(db.String(255))
+    result_name = db.Column(db.String(255))
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    created_by = db.Column(db.Integer, db.ForeignKey("users.id"))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)  # refreshed by the running process, see JobRunner.heartbeat
+    finished_at = db.Column(db.DateTime)
+
+    creator = db.relationship("User")
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in {"succeeded", "failed", "cancelled"}
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": json.loads(self.result) if self.result else None,
+            "has_file": bool(self.result_path),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
 class UploadedFile(db.Model):
     __tablename__ = "uploaded_files"
 
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import threading
+from typing import Any
+
+from .models import permission_cache
+
+
+class NavigationMenuCache:
+    """Sidebar menu compiled once and memoized per distinct permission set.
+
+    The menu definition is frozen into tuples at construction time; each
+    filtered tree is computed once for a given set of permission codes and
+    then served with a dict lookup.  The cache is dropped whenever
+    ``permission_cache`` is invalidated (role/permission changes).
+    """
+
+    def __init__(self, menu_definition: list[dict[str, Any]]) -> None:
+        self._items = self._compile(menu_definition)
+        self._menus: dict[frozenset[str] | None, tuple[dict[str, Any], ...]] = {}
+        self._version = permission_cache.version
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def _compile(cls, items: list[dict[str, Any]]) -> tuple[dict[str, Any], ...]:
+        compiled = []
+        for item in items:
+            new_item = dict(item)
+            if item.get("children"):
+                new_item["children"] = cls._compile(item["children"])
+            compiled.append(new_item)
+        return tuple(compiled)
+
+    @classmethod
+    def _filter(cls, items, codes: frozenset[str] | None) -> tuple[dict[str, Any], ...]:
+        filtered = []
+        for item in items:
+            perm = item.get("permission")
+            if perm and (codes is None or perm not in codes):
+                continue
+            children = item.get("children")
+            if children:
+                allowed_children = cls._filter(children, codes)
+                if not allowed_children:
+                    continue
+                item = {**item, "children": allowed_children}
+            filtered.append(item)
+        return tuple(filtered)
+
+    def menu_for(self, user) -> tuple[dict[str, Any], ...]:
+        codes = user.permission_codes if user.is_authenticated else None
+        if self._version != permission_cache.version:
+            self.invalidate()
+        menu = self._menus.get(codes)
+        if menu is not None:
+            self.hits += 1
+            return menu
+        self.misses += 1
+        menu = self._filter(self._items, codes)
+        with self._lock:
+            self._menus[codes] = menu
+        return menu
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._menus.clear()
+            self._version = permission_cache.version
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._menus)}
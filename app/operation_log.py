@@ -0,0 +1,172 @@
+"""Buffered writer behind ``utils.log_operation``.
+
+Entries go into a bounded in-process queue and a background thread writes
+them with one multi-row insert every ``OPERATION_LOG_BATCH_SIZE`` entries or
+``OPERATION_LOG_FLUSH_MS`` milliseconds, on its own connection, so a view no
+longer pays for a second commit after its real write.  When the queue is
+full the caller waits up to ``OPERATION_LOG_BLOCK_MS`` and the entry is then
+dropped and counted.  Pending entries are flushed at interpreter exit.  With
+``OPERATION_LOG_MODE = "sync"`` (the default under ``TESTING``) every entry
+is written before ``submit`` returns.
+"""
+
+from __future__ import annotations
+
+import atexit
+import queue
+import threading
+import time
+from typing import Any
+
+from flask import Flask, current_app
+from sqlalchemy import insert
+
+from .extensions import db
+from .models import OperationLog
+
+
+class OperationLogWriter:
+    def __init__(self, app: Flask) -> None:
+        self.app = app
+        self.mode = app.config.get("OPERATION_LOG_MODE", "async")
+        if app.testing:
+            self.mode = "sync"
+        self.batch_size = max(int(app.config.get("OPERATION_LOG_BATCH_SIZE", 200)), 1)
+        self.flush_interval = app.config.get("OPERATION_LOG_FLUSH_MS", 500) / 1000
+        self.block_timeout = app.config.get("OPERATION_LOG_BLOCK_MS", 50) / 1000
+        self._queue: queue.Queue[dict[str, Any]] = queue.Queue(app.config.get("OPERATION_LOG_QUEUE_SIZE", 10000))
+        self._thread: threading.Thread | None = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._progress = threading.Condition()
+        self._enqueued = 0  # entries put on the queue so far
+        self._finished = 0  # entries written or failed so far
+        self.written = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.failed = 0
+
+    def submit(self, entry: dict[str, Any]) -> None:
+        if self.mode == "sync":
+            self._write([entry])
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(entry)
+            self._count_enqueued()
+            return
+        except queue.Full:
+            with self._lock:
+                self.blocked += 1
+        try:
+            self._queue.put(entry, timeout=self.block_timeout)
+            self._count_enqueued()
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped == 1 or dropped % 1000 == 0:
+                current_app.logger.warning("operation log queue full, %s entries dropped so far", dropped)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until the entries queued before this call are written (or have failed).
+
+        Entries submitted meanwhile are not waited for, so steady traffic
+        cannot keep the caller here.  Returns ``False`` if ``timeout``
+        seconds passed first.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._drain()
+            return True
+        with self._progress:
+            target = self._enqueued
+            return self._progress.wait_for(lambda: self._finished >= target, timeout)
+
+    def close(self) -> None:
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.flush_interval * 4, 5))
+        self._drain()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+            "failed": self.failed,
+        }
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="operation-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _drain(self) -> None:
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write_batch(batch)
+
+    def _count_enqueued(self) -> None:
+        with self._progress:
+            self._enqueued += 1
+
+    def _write_batch(self, batch: list[dict[str, Any]]) -> None:
+        try:
+            self._write(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+            with self._progress:
+                self._finished += len(batch)
+                self._progress.notify_all()
+
+    def _write(self, entries: list[dict[str, Any]]) -> None:
+        try:
+            with self.app.app_context(), db.engine.begin() as connection:
+                connection.execute(insert(OperationLog), entries)
+        except Exception:  # noqa: BLE001 - audit logging must never break the caller or the writer thread
+            with self._lock:
+                self.failed += len(entries)
+            self.app.logger.exception("failed to write %s operation log entries", len(entries))
+            return
+        with self._lock:
+            self.written += len(entries)
+
+
+def get_log_writer() -> OperationLogWriter:
+    return current_app.extensions["operation_log_writer"]
+
+
+def init_app(app: Flask) -> None:
+    writer = OperationLogWriter(app)
+    app.extensions["operation_log_writer"] = writer
+    atexit.register(writer.close)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, NamedTuple
+
+import click
+from flask import Flask
+from sqlalchemy import false, func, select, text
+
+from .extensions import db
+from .models import AttendanceRecord, GradeRecord, LeaveRequest, OperationLog, SystemMessage, TodoItem
+
+
+class HotQuery(NamedTuple):
+    name: str
+    build: Callable[[], Any]
+    tables: tuple[str, ...]  # tables that must not be read with a full scan
+
+
+HOT_QUERIES: list[HotQuery] = [
+    HotQuery(
+        "grade lookup by natural key",
+        lambda: select(GradeRecord.id, GradeRecord.score).where(
+            GradeRecord.student_id == 1,
+            GradeRecord.course_id == 1,
+            GradeRecord.term == "2023-2024",
+            GradeRecord.assessment_type == "期末",
+        ),
+        ("grade_records",),
+    ),
+    HotQuery(
+        "grades by course and term",
+        lambda: select(GradeRecord.student_id, GradeRecord.score).where(
+            GradeRecord.course_id == 1, GradeRecord.term == "2023-2024"
+        ),
+        ("grade_records",),
+    ),
+    HotQuery(
+        "latest grades (search page)",
+        lambda: select(GradeRecord.id)
+        .order_by(GradeRecord.recorded_at.desc(), GradeRecord.id.desc())
+        .limit(50),
+        ("grade_records",),
+    ),
+    HotQuery(
+        "attendance by course and date",
+        lambda: select(AttendanceRecord.student_id, AttendanceRecord.status).where(
+            AttendanceRecord.course_id == 1, AttendanceRecord.record_date == date(2024, 3, 1)
+        ),
+        ("attendance_records",),
+    ),
+    HotQuery(
+        "attendance status counts for the last 30 days",
+        lambda: select(AttendanceRecord.status, func.count(AttendanceRecord.id))
+        .where(AttendanceRecord.record_date >= date.today() - timedelta(days=30))
+        .group_by(AttendanceRecord.status),
+        ("attendance_records",),
+    ),
+    HotQuery(
+        "latest operation logs",
+        lambda: select(OperationLog.id)
+        .order_by(OperationLog.created_at.desc(), OperationLog.id.desc())
+        .limit(200),
+        ("operation_logs",),
+    ),
+    HotQuery(
+        "operation logs in a time range",
+        lambda: select(OperationLog.id).where(
+            OperationLog.created_at >= datetime(2024, 1, 1), OperationLog.created_at < datetime(2024, 2, 1)
+        ),
+        ("operation_logs",),
+    ),
+    HotQuery(
+        "unread messages for a user",
+        lambda: select(SystemMessage.id)
+        .where(SystemMessage.user_id == 1, SystemMessage.is_read == false())
+        .order_by(SystemMessage.created_at.desc())
+        .limit(5),
+        ("system_messages",),
+    ),
+    HotQuery(
+        "open todos for a user",
+        lambda: select(TodoItem.id)
+        .where(TodoItem.user_id == 1, TodoItem.is_completed == false())
+        .order_by(TodoItem.due_date.asc())
+        .limit(5),
+        ("todo_items",),
+    ),
+    HotQuery(
+        "latest leave requests",
+        lambda: select(LeaveRequest.id)
+        .order_by(LeaveRequest.created_at.desc(), LeaveRequest.id.desc())
+        .limit(30),
+        ("leave_requests",),
+    ),
+]
+
+
+def explain(statement) -> list[tuple[str, bool]]:
+    """Return ``(table, full_scan)`` pairs from the database's plan for ``statement``."""
+    bind = db.session.get_bind()
+    dialect = bind.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        plan = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        steps = []
+        for row in plan:
+            detail = row[-1]
+            words = detail.replace(" TABLE ", " ").split()
+            if len(words) >= 2 and words[0] in {"SCAN", "SEARCH"}:
+                steps.append((words[1], words[0] == "SCAN" and "INDEX" not in detail))
+        return steps
+    if dialect.name == "mysql":
+        rows = db.session.execute(text(f"EXPLAIN {sql}")).mappings().all()
+        return [(row["table"], row["type"] == "ALL") for row in rows if row["table"]]
+    raise click.ClickException(f"不支持的数据库类型: {dialect.name}")
+
+
+def check_query_plans() -> list[tuple[HotQuery, list[tuple[str, bool]], list[str]]]:
+    results = []
+    for query in HOT_QUERIES:
+        steps = explain(query.build())
+        scanned = [table for table, full_scan in steps if full_scan and table in query.tables]
+        results.append((query, steps, scanned))
+    return results
+
+
+def init_app(app: Flask) -> None:
+    @app.cli.command("db-index-check")
+    def db_index_check() -> None:
+        """EXPLAIN the registered hot queries and fail if any falls back to a full table scan."""
+        failures = 0
+        for query, steps, scanned in check_query_plans():
+            plan = ", ".join(f"{table}{' (full scan)' if full_scan else ''}" for table, full_scan in steps)
+            status = "FAIL" if scanned else "ok"
+            click.echo(f"[{status}] {query.name}: {plan}")
+            failures += bool(scanned)
+        if failures:
+            raise click.ClickException(f"{failures} 条热点查询退化为全表扫描")
+        click.echo("all hot queries use indexes")
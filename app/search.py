@@ -0,0 +1,219 @@
+"""Keyword search over students and courses.
+
+Every backend turns a keyword into a subquery of ``(id, score)`` rows, a
+higher score meaning a better match, which callers join against and order
+by.  The backend is picked from the database dialect: MySQL uses FULLTEXT
+indexes built with the ngram parser so CJK names tokenise, SQLite uses FTS5
+tables with the trigram tokenizer kept in sync by triggers, and anything
+else (or ``SEARCH_BACKEND=like``) falls back to a ``LIKE`` scan.  Keywords
+shorter than the index's token size cannot be matched by the index and use
+the ``LIKE`` scan as well.
+"""
+
+from __future__ import annotations
+
+import click
+from flask import Flask, current_app
+from sqlalchemy import case, column, func, inspect, literal_column, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+
+from .extensions import db
+from .models import Course, Student
+
+STUDENT_SEARCH_COLUMNS = ("student_number", "name", "email")
+COURSE_SEARCH_COLUMNS = ("name",)
+
+
+class SearchBackend:
+    """``LIKE`` based matching; exact matches rank above prefix matches above substrings."""
+
+    name = "like"
+    min_token_length = 1
+
+    def student_matches(self, keyword: str):
+        return self._like_matches(Student, STUDENT_SEARCH_COLUMNS, keyword)
+
+    def course_matches(self, keyword: str):
+        return self._like_matches(Course, COURSE_SEARCH_COLUMNS, keyword)
+
+    def ensure_schema(self) -> bool:
+        """Make sure the index structures exist; ``False`` means the backend cannot be used."""
+        return True
+
+    def rebuild(self) -> None:
+        """Recreate the search index from the base tables."""
+
+    @staticmethod
+    def _like_matches(model, column_names: tuple[str, ...], keyword: str):
+        columns = [getattr(model, name) for name in column_names]
+        escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        score = case(
+            (or_(*(func.lower(col) == keyword.lower() for col in columns)), 3),
+            (or_(*(col.ilike(f"{escaped}%", escape="\\") for col in columns)), 2),
+            else_=1,
+        )
+        return (
+            select(model.id.label("id"), score.label("score"))
+            .where(or_(*(col.ilike(f"%{escaped}%", escape="\\") for col in columns)))
+            .subquery()
+        )
+
+
+class MySQLFullTextBackend(SearchBackend):
+    name = "mysql-fulltext"
+    min_token_length = 2  # InnoDB ngram_token_size default
+
+    indexes = {
+        "students": ("ft_students_search", STUDENT_SEARCH_COLUMNS),
+        "courses": ("ft_courses_name", COURSE_SEARCH_COLUMNS),
+    }
+
+    def student_matches(self, keyword: str):
+        if len(keyword) < self.min_token_length:
+            return super().student_matches(keyword)
+        return self._fulltext_matches(Student, STUDENT_SEARCH_COLUMNS, keyword)
+
+    def course_matches(self, keyword: str):
+        if len(keyword) < self.min_token_length:
+            return super().course_matches(keyword)
+        return self._fulltext_matches(Course, COURSE_SEARCH_COLUMNS, keyword)
+
+    @staticmethod
+    def _fulltext_matches(model, column_names: tuple[str, ...], keyword: str):
+        from sqlalchemy.dialects.mysql import match
+
+        # A quoted phrase keeps the ngram sequence together, so "张三" does not
+        # match every name containing "张" or "三".
+        phrase = '"' + keyword.replace('"', " ") + '"'
+        score = match(*(getattr(model, name) for name in column_names), against=phrase).in_boolean_mode()
+        return select(model.id.label("id"), score.label("score")).where(score).subquery()
+
+    def _missing_indexes(self) -> list[str]:
+        rows = db.session.execute(
+            text(
+                "SELECT DISTINCT table_name, index_name FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND index_type = 'FULLTEXT'"
+            )
+        ).all()
+        existing = {(table_name, index_name) for table_name, index_name in rows}
+        return [
+            table_name
+            for table_name, (index_name, _) in self.indexes.items()
+            if (table_name, index_name) not in existing
+        ]
+
+    def ensure_schema(self) -> bool:
+        missing = self._missing_indexes()
+        if missing:
+            current_app.logger.warning("FULLTEXT index missing on %s; run `flask search-rebuild`", ", ".join(missing))
+        return not missing
+
+    def rebuild(self) -> None:
+        for table_name in self._missing_indexes():
+            index_name, column_names = self.indexes[table_name]
+            db.session.execute(
+                text(
+                    f"ALTER TABLE {table_name} ADD FULLTEXT INDEX {index_name} "
+                    f"({', '.join(column_names)}) WITH PARSER ngram"
+                )
+            )
+        db.session.commit()
+
+
+class SQLiteFTSBackend(SearchBackend):
+    name = "sqlite-fts5"
+    min_token_length = 3  # the trigram tokenizer cannot match shorter strings
+
+    sources = {"students": STUDENT_SEARCH_COLUMNS, "courses": COURSE_SEARCH_COLUMNS}
+
+    def student_matches(self, keyword: str):
+        if len(keyword) < self.min_token_length:
+            return super().student_matches(keyword)
+        return self._fts_matches("students", keyword)
+
+    def course_matches(self, keyword: str):
+        if len(keyword) < self.min_token_length:
+            return super().course_matches(keyword)
+        return self._fts_matches("courses", keyword)
+
+    @staticmethod
+    def _fts_matches(source: str, keyword: str):
+        fts = table(f"{source}_fts", column("rowid"))
+        fts_name = literal_column(fts.name)
+        phrase = '"' + keyword.replace('"', '""') + '"'
+        return (
+            select(fts.c.rowid.label("id"), (-func.bm25(fts_name)).label("score"))
+            .where(fts_name.op("MATCH")(phrase))
+            .subquery()
+        )
+
+    @staticmethod
+    def _statements(source: str, columns: tuple[str, ...]) -> list[str]:
+        fts = f"{source}_fts"
+        names = ", ".join(columns)
+        new_values = ", ".join(f"new.{name}" for name in columns)
+        old_values = ", ".join(f"old.{name}" for name in columns)
+        delete_old = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+        insert_new = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});"
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, "
+            f"content='{source}', content_rowid='id', tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN {delete_old} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {source} BEGIN {delete_old} {insert_new} END",
+        ]
+
+    def ensure_schema(self) -> bool:
+        existing = set(inspect(db.engine).get_table_names())
+        try:
+            with db.engine.begin() as connection:
+                for source, columns in self.sources.items():
+                    for statement in self._statements(source, columns):
+                        connection.execute(text(statement))
+                    if f"{source}_fts" not in existing:
+                        connection.execute(text(f"INSERT INTO {source}_fts({source}_fts) VALUES ('rebuild')"))
+        except OperationalError:
+            current_app.logger.warning("SQLite FTS5 with the trigram tokenizer is unavailable; using LIKE search")
+            return False
+        return True
+
+    def rebuild(self) -> None:
+        with db.engine.begin() as connection:
+            for source in self.sources:
+                connection.execute(text(f"INSERT INTO {source}_fts({source}_fts) VALUES ('rebuild')"))
+
+
+BACKENDS: dict[str, type[SearchBackend]] = {
+    "mysql": MySQLFullTextBackend,
+    "sqlite": SQLiteFTSBackend,
+}
+
+
+def get_search_backend() -> SearchBackend:
+    return current_app.extensions["search_backend"]
+
+
+def init_app(app: Flask) -> None:
+    """Pick the backend for the configured database; call after the tables exist."""
+    backend: SearchBackend = SearchBackend()
+    if app.config.get("SEARCH_BACKEND", "auto") == "auto":
+        backend_class = BACKENDS.get(db.engine.dialect.name)
+        if backend_class is not None:
+            candidate = backend_class()
+            if candidate.ensure_schema():
+                backend = candidate
+    app.extensions["search_backend"] = backend
+
+    @app.cli.command("search-rebuild")
+    def search_rebuild() -> None:
+        """Create missing search indexes and rebuild them from the base tables."""
+        backend_class = BACKENDS.get(db.engine.dialect.name)
+        if backend_class is None:
+            click.echo(f"{db.engine.dialect.name} 使用 LIKE 搜索，无需建立索引")
+            return
+        rebuilt = backend_class()
+        if isinstance(rebuilt, SQLiteFTSBackend):
+            rebuilt.ensure_schema()
+        rebuilt.rebuild()
+        app.extensions["search_backend"] = rebuilt
+        click.echo(f"search index rebuilt ({rebuilt.name})")
@@ -62,6 +62,37 @@
     }
   });
 
+  document.querySelectorAll('input[data-suggest]').forEach((input) => {
+    const list = document.createElement('datalist');
+    list.id = `${input.id || input.name}-suggestions`;
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+    input.after(list);
+    let timer = null;
+
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      const q = input.value.trim();
+      if (!q) return;
+      timer = setTimeout(() => {
+        const params = new URLSearchParams({ q, types: input.dataset.suggest });
+        fetch(`/api/suggest?${params}`)
+          .then((response) => (response.ok ? response.json() : []))
+          .then((items) => {
+            list.replaceChildren(
+              ...items.map((item) => {
+                const option = document.createElement('option');
+                option.value = item.code;
+                option.label = item.label;
+                return option;
+              })
+            );
+          })
+          .catch(() => {});
+      }, 150);
+    });
+  });
+
   window.addEventListener('resize', function () {
     const isDesktop = window.matchMedia('(min-width: 1024px)').matches;
     if (isDesktop) {
@@ -0,0 +1,219 @@
+"""In-process prefix index behind ``/api/suggest``.
+
+Names and numbers of students, teachers and courses are kept as lower-cased
+keys in one sorted list, so a lookup is a binary search plus a short scan.
+Every Chinese name also gets its full pinyin ("zhangsan") and initials
+("zs") as keys.  The index is built on the first lookup and patched from
+mapper events once the writing transaction commits.  After bulk statements
+or ``SUGGEST_INDEX_TTL`` seconds (to pick up writes made by other processes)
+it is rebuilt in a background thread while lookups keep using the old one.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left, insort
+from typing import Any, NamedTuple
+
+from flask import Flask, current_app
+from pypinyin import Style, lazy_pinyin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from .extensions import db
+from .models import Course, Student, Teacher
+
+
+class SuggestSource(NamedTuple):
+    model: Any
+    label: str  # attribute shown to the user
+    code: str  # number / code attribute
+
+
+SOURCES: dict[str, SuggestSource] = {
+    "student": SuggestSource(Student, "name", "student_number"),
+    "teacher": SuggestSource(Teacher, "name", "employee_number"),
+    "course": SuggestSource(Course, "name", "code"),
+}
+SOURCE_BY_MODEL = {source.model: kind for kind, source in SOURCES.items()}
+SOURCE_BY_TABLE = {source.model.__tablename__: kind for kind, source in SOURCES.items()}
+
+
+def index_keys(label: str, code: str) -> set[str]:
+    keys = {label.lower(), code.lower()}
+    if any("一" <= char <= "鿿" for char in label):
+        syllables = lazy_pinyin(label, errors="ignore")
+        keys.add("".join(syllables).lower())
+        keys.add("".join(lazy_pinyin(label, style=Style.FIRST_LETTER, errors="ignore")).lower())
+    keys.discard("")
+    return keys
+
+
+class SuggestIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._keys: list[tuple[str, str, int]] = []  # (key, kind, id), sorted
+        self._entries: dict[tuple[str, int], tuple[str, str, set[str]]] | None = None  # -> (label, code, keys)
+        self._built_at = 0.0
+        self._expired = False
+        self._rebuilding = False
+        self._backlog: list[dict] | None = None  # changes committed while a rebuild is loading
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._expired = True
+
+    def _refresh(self) -> None:
+        app = current_app._get_current_object()
+        ttl = app.config.get("SUGGEST_INDEX_TTL", 300)
+        with self._lock:
+            cold = self._entries is None
+            due = cold or self._expired or time.monotonic() - self._built_at >= ttl
+            start = due and not self._rebuilding
+            if start:
+                self._rebuilding = True
+        if not cold:
+            if start:
+                threading.Thread(target=self._rebuild, args=(app,), name="suggest-index", daemon=True).start()
+            return
+        # Nothing to serve yet: build in this request, or wait for the build under way.
+        if start:
+            self._rebuild(app)
+        else:
+            with self._build_lock:
+                pass
+
+    def _rebuild(self, app: Flask) -> None:
+        with self._build_lock:
+            try:
+                with self._lock:
+                    self._expired = False
+                    self._backlog = []
+                entries = {}
+                with app.app_context():
+                    for kind, source in SOURCES.items():
+                        model = source.model
+                        rows = db.session.query(model.id, getattr(model, source.label), getattr(model, source.code))
+                        for row_id, label, code in rows:
+                            entries[(kind, row_id)] = (label or "", code or "", index_keys(label or "", code or ""))
+                    db.session.remove()
+                keys = sorted((key, kind, row_id) for (kind, row_id), (_, _, keys) in entries.items() for key in keys)
+                with self._lock:
+                    self._entries, self._keys = entries, keys
+                    for changes in self._backlog:
+                        self._patch(changes)
+                    self._built_at = time.monotonic()
+            except Exception:  # noqa: BLE001 - keep serving the old index; retried on a later lookup
+                app.logger.exception("suggest index rebuild failed")
+            finally:
+                with self._lock:
+                    self._backlog = None
+                    self._rebuilding = False
+
+    def _remove(self, kind: str, row_id: int) -> None:
+        entry = self._entries.pop((kind, row_id), None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            position = bisect_left(self._keys, (key, kind, row_id))
+            if position < len(self._keys) and self._keys[position] == (key, kind, row_id):
+                del self._keys[position]
+
+    def apply(self, changes: dict[tuple[str, int], tuple[str, str] | None]) -> None:
+        """Patch committed changes in; ``None`` marks a deleted row."""
+        with self._lock:
+            if self._entries is None:
+                return
+            self._patch(changes)
+            if self._backlog is not None:
+                # The rebuild may have read the rows before this commit; replay after the swap.
+                self._backlog.append(changes)
+
+    def _patch(self, changes: dict[tuple[str, int], tuple[str, str] | None]) -> None:
+        for (kind, row_id), values in changes.items():
+            self._remove(kind, row_id)
+            if values is not None:
+                label, code = values
+                keys = index_keys(label, code)
+                self._entries[(kind, row_id)] = (label, code, keys)
+                for key in keys:
+                    insort(self._keys, (key, kind, row_id))
+
+    def lookup(self, prefix: str, kinds: set[str] | None = None, limit: int = 10) -> list[dict[str, Any]]:
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        self._refresh()
+        exact, partial, seen = [], [], set()
+        with self._lock:
+            position = bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(exact) + len(partial) < limit:
+                key, kind, row_id = self._keys[position]
+                position += 1
+                if not key.startswith(prefix):
+                    break
+                if (kinds and kind not in kinds) or (kind, row_id) in seen:
+                    continue
+                seen.add((kind, row_id))
+                label, code, _ = self._entries[(kind, row_id)]
+                item = {"type": kind, "id": row_id, "label": label, "code": code}
+                (exact if key == prefix else partial).append(item)
+        return exact + partial
+
+    def __len__(self) -> int:
+        return len(self._entries or {})
+
+
+suggest_index = SuggestIndex()
+
+
+def _record_change(mapper, connection, target, deleted: bool = False) -> None:
+    session = object_session(target)
+    if session is None:
+        return
+    kind = SOURCE_BY_MODEL[mapper.class_]
+    source = SOURCES[kind]
+    changes = session.info.setdefault("suggest_changes", {})
+    changes[(kind, target.id)] = (
+        None if deleted else (getattr(target, source.label) or "", getattr(target, source.code) or "")
+    )
+
+
+def _record_delete(mapper, connection, target) -> None:
+    _record_change(mapper, connection, target, deleted=True)
+
+
+for _source in SOURCES.values():
+    event.listen(_source.model, "after_insert", _record_change)
+    event.listen(_source.model, "after_update", _record_change)
+    event.listen(_source.model, "after_delete", _record_delete)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_statement(orm_execute_state) -> None:
+    # Bulk INSERT/UPDATE/DELETE statements (e.g. student imports) bypass the
+    # mapper events; rebuild from scratch after they commit.
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if getattr(table, "name", None) in SOURCE_BY_TABLE:
+        orm_execute_state.session.info["suggest_stale"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_suggest_changes(session) -> None:
+    if session.info.pop("suggest_stale", False):
+        session.info.pop("suggest_changes", None)
+        suggest_index.invalidate()
+        return
+    changes = session.info.pop("suggest_changes", None)
+    if changes:
+        suggest_index.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_suggest_changes(session) -> None:
+    session.info.pop("suggest_changes", None)
+    session.info.pop("suggest_stale", None)
@@ -0,0 +1,123 @@
+"""Typed, cached access to ``system_settings``.
+
+:data:`SETTINGS` declares the parameters the application reads: how the
+stored text is parsed and validated, and the default used while no row
+exists (or a stored value does not parse).  All rows are loaded into one
+immutable snapshot per process.  ``system_settings`` is a tracked table in
+:mod:`app.table_versions`, so a save bumps its counter and every worker
+reloads within ``TABLE_VERSION_TTL`` seconds (the saving worker right after
+its commit); in between, :func:`get_setting` costs no query.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, NamedTuple
+
+from flask import current_app
+
+from .extensions import db
+from .models import SystemSetting
+from .table_versions import table_versions
+
+
+class SettingSpec(NamedTuple):
+    parse: Callable[[str], Any]  # raises ValueError with a message for the settings page
+    default: Any
+    description: str
+    config_key: str | None = None  # when set, the Config value is the default
+
+
+def _text(value: str) -> str:
+    value = value.strip()
+    if not value:
+        raise ValueError("值不能为空")
+    return value
+
+
+def _term(value: str) -> str:
+    value = value.strip()
+    match = re.fullmatch(r"(\d{4})-(\d{4})", value)
+    if not match or int(match.group(2)) != int(match.group(1)) + 1:
+        raise ValueError("学年格式应为 2023-2024")
+    return value
+
+
+def _number_between(kind: type, low: float, high: float) -> Callable[[str], Any]:
+    def parse(value: str) -> Any:
+        try:
+            number = kind(value.strip())
+        except ValueError:
+            raise ValueError(f"应为{'整数' if kind is int else '数字'}") from None
+        if not low <= number <= high:
+            raise ValueError(f"取值范围为 {low}–{high}")
+        return number
+
+    return parse
+
+
+def _choice(*choices: int) -> Callable[[str], int]:
+    def parse(value: str) -> int:
+        number = _number_between(int, min(choices), max(choices))(value)
+        if number not in choices:
+            raise ValueError(f"可选值为 {', '.join(map(str, choices))}")
+        return number
+
+    return parse
+
+
+PAGE_SIZE_CHOICES = (10, 15, 20, 30, 50)
+
+SETTINGS: dict[str, SettingSpec] = {
+    "current_term": SettingSpec(_term, "2023-2024", "当前学年，成绩录入等页面的默认学期"),
+    "page_size": SettingSpec(_choice(*PAGE_SIZE_CHOICES), 15, "列表默认每页条数"),
+    "grade_pass_mark": SettingSpec(_number_between(float, 0, 100), 60.0, "及格线", "GRADE_PASS_MARK"),
+    "school_name": SettingSpec(_text, "", "学校名称显示"),
+    "contact_phone": SettingSpec(_text, "", "校务联系电话"),
+}
+
+
+def parse_setting(key: str, value: str) -> Any:
+    """Validate ``value`` for ``key``; undeclared keys are kept as plain text."""
+    spec = SETTINGS.get(key)
+    return spec.parse(value) if spec is not None else value
+
+
+class SettingsCache:
+    def __init__(self) -> None:
+        self._snapshot: Mapping[str, Any] | None = None
+        self._version: tuple | None = None
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Mapping[str, Any]:
+        version = table_versions.current([SystemSetting.__tablename__])[SystemSetting.__tablename__]
+        snapshot = self._snapshot
+        if snapshot is not None and self._version == version:
+            return snapshot
+        snapshot = self._load()
+        with self._lock:
+            self._snapshot, self._version = snapshot, version
+        return snapshot
+
+    def _load(self) -> Mapping[str, Any]:
+        values: dict[str, Any] = {
+            key: current_app.config.get(spec.config_key, spec.default) if spec.config_key else spec.default
+            for key, spec in SETTINGS.items()
+        }
+        for key, raw in db.session.query(SystemSetting.key, SystemSetting.value):
+            if raw is None:
+                continue
+            try:
+                values[key] = parse_setting(key, raw)
+            except ValueError as exc:
+                current_app.logger.warning("system setting %s=%r ignored: %s", key, raw, exc)
+        return MappingProxyType(values)
+
+
+settings_cache = SettingsCache()
+
+
+def get_setting(key: str) -> Any:
+    return settings_cache.snapshot()[key]
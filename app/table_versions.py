@@ -0,0 +1,126 @@
+"""Per-table change counters behind the API's conditional GETs and the settings snapshot.
+
+A transaction that writes a tracked table (through the unit of work or a
+bulk statement) bumps its row in ``table_versions`` just before it commits,
+so the counters are shared by all worker processes.  Readers go through
+:data:`table_versions`, an in-process copy refreshed every
+``TABLE_VERSION_TTL`` seconds (and right after a local commit), which lets a
+matching ``If-None-Match`` be answered without a database round trip.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from typing import Iterable
+
+from flask import Flask, current_app
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session, object_session
+
+from .extensions import db
+from .models import Announcement, Classroom, Course, Student, SystemSetting, TableVersion
+
+VERSIONED_MODELS = (Announcement, Classroom, Course, Student, SystemSetting)
+VERSIONED_TABLES = frozenset(model.__tablename__ for model in VERSIONED_MODELS)
+
+
+class TableVersionCache:
+    def __init__(self) -> None:
+        self._versions: dict[str, tuple[int, datetime | None]] = {}
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self, tables: Iterable[str]) -> dict[str, tuple[int, datetime | None]]:
+        """Return ``{table: (version, updated_at)}``; tables never written report ``(0, None)``."""
+        now = time.monotonic()
+        if now >= self._expires_at:
+            rows = db.session.execute(select(TableVersion.table_name, TableVersion.version, TableVersion.updated_at))
+            versions = {name: (version, updated_at) for name, version, updated_at in rows}
+            with self._lock:
+                self._versions = versions
+                self._expires_at = now + current_app.config.get("TABLE_VERSION_TTL", 5)
+        versions = self._versions
+        return {table: versions.get(table, (0, None)) for table in tables}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._expires_at = 0.0
+
+
+table_versions = TableVersionCache()
+
+
+def bump(connection, tables: set[str]) -> None:
+    """Increment the counters of ``tables`` on the writing transaction's ``connection``."""
+    if not tables:
+        return
+    table = TableVersion.__table__
+    now = datetime.utcnow()
+    updated = connection.execute(
+        update(table).where(table.c.table_name.in_(tables)).values(version=table.c.version + 1, updated_at=now)
+    ).rowcount
+    if updated < len(tables):
+        existing = set(connection.execute(select(table.c.table_name).where(table.c.table_name.in_(tables))).scalars())
+        connection.execute(
+            insert(table), [{"table_name": name, "version": 1, "updated_at": now} for name in tables - existing]
+        )
+
+
+def _mark_changed(session, name: str) -> None:
+    session.info.setdefault("changed_tables", set()).add(name)
+    session.info.setdefault("unbumped_tables", set()).add(name)
+
+
+def _record_change(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None:
+        _mark_changed(session, mapper.local_table.name)
+
+
+for _model in VERSIONED_MODELS:
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event, _record_change)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_statement(orm_execute_state) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    name = getattr(getattr(orm_execute_state.statement, "table", None), "name", None)
+    if name in VERSIONED_TABLES:
+        _mark_changed(orm_execute_state.session, name)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_changed_tables(session) -> None:
+    # Bump at commit time rather than per flush so the counter rows stay
+    # locked only for the end of the writing transaction.
+    session.flush()
+    tables = session.info.pop("unbumped_tables", None)
+    if tables:
+        bump(session.connection(), tables)
+
+
+@event.listens_for(Session, "after_commit")
+def _refresh_after_commit(session) -> None:
+    if session.info.pop("changed_tables", None):
+        table_versions.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session) -> None:
+    session.info.pop("changed_tables", None)
+    session.info.pop("unbumped_tables", None)
+
+
+def init_app(app: Flask) -> None:
+    """Create the missing counter rows; call after the tables exist."""
+    table = TableVersion.__table__
+    existing = set(db.session.execute(select(table.c.table_name)).scalars())
+    missing = VERSIONED_TABLES - existing
+    if missing:
+        now = datetime.utcnow()
+        db.session.execute(insert(table), [{"table_name": name, "version": 0, "updated_at": now} for name in missing])
+        db.session.commit()
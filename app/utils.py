@@ -1,19 +1,47 @@
 from __future__ import annotations
 
+import csv
+import hashlib
+import json
 import os
-from datetime import datetime
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from decimal import Decimal
 from functools import wraps
-from io import BytesIO
+from io import StringIO
+from itertools import islice
 from pathlib import Path
-from typing import Any, Callable, Iterable
-
-from flask import abort, current_app, flash, redirect, request, url_for
+from typing import IO, Any, Callable, Iterable, Iterator, Sequence
+
+from flask import (
+    Response,
+    abort,
+    current_app,
+    flash,
+    has_request_context,
+    make_response,
+    redirect,
+    request,
+    send_file,
+    stream_with_context,
+    url_for,
+)
 from flask_login import current_user
-from itsdangerous import BadSignature, URLSafeTimedSerializer
+from itsdangerous import BadSignature, URLSafeSerializer, URLSafeTimedSerializer
 from openpyxl import Workbook, load_workbook
+from sqlalchemy import and_, bindparam, func, insert, or_, update
+from werkzeug.http import is_resource_modified
 
+from .attendance_rollup import apply_attendance_deltas, daily_key, recount_attendance
 from .extensions import db
-from .models import OperationLog, Role
+from .grade_aggregates import GradeDeltas, aggregate_key, apply_grade_deltas
+from .models import AttendanceRecord, Classroom, GradeRecord, Role, Student
+from .operation_log import get_log_writer
+from .table_versions import VERSIONED_TABLES, table_versions
 
 
 def get_upload_path() -> Path:
@@ -67,6 +95,49 @@ def permission_required(code: str) -> Callable:
     return decorator
 
 
+def conditional_get(*tables: str, unversioned_args: Sequence[str] = ()) -> Callable:
+    """Tag a GET response with ETag/Last-Modified from the ``tables`` change counters.
+
+    A request whose validators still match is answered with 304 before the
+    view runs.  Requests using any of ``unversioned_args`` (filters that read
+    tables without a counter) are served fresh, without validators.
+    """
+
+    unknown = set(tables) - VERSIONED_TABLES
+    if unknown:
+        raise ValueError(f"tables without a change counter: {', '.join(sorted(unknown))}")
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if any(request.args.get(name) for name in unversioned_args):
+                return func(*args, **kwargs)
+            versions = table_versions.current(tables)
+            stamp = ";".join(f"{table}:{versions[table][0]}" for table in sorted(tables))
+            accept = request.headers.get("Accept", "")
+            etag = hashlib.sha1(f"{request.full_path}|{accept}|{stamp}".encode()).hexdigest()
+            modified = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+            last_modified = max(modified) if modified else None
+            if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = make_response(func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            else:
+                response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+            response.cache_control.private = True
+            response.cache_control.max_age = current_app.config.get("API_CACHE_MAX_AGE", 10)
+            response.cache_control.must_revalidate = True
+            response.vary.add("Accept")
+            return response
+
+        return wrapper
+
+    return decorator
+
+
 def generate_token(user_id: int, purpose: str = "password-reset") -> str:
     serializer = URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
     return serializer.dumps({"user_id": user_id, "purpose": purpose})
@@ -84,23 +155,344 @@ def verify_token(token: str, max_age: int = 3600, purpose: str = "password-reset
 
 
 def log_operation(user_id: int | None, action: str, resource: str, description: str = "") -> None:
-    log = OperationLog(
-        user_id=user_id,
-        action=action,
-        resource=resource,
-        description=description,
-        ip_address=request.remote_addr if request else None,
+    """Queue an audit entry; it is written in the background by ``operation_log.OperationLogWriter``."""
+    get_log_writer().submit(
+        {
+            "user_id": user_id,
+            "action": action[:100],
+            "resource": (resource or "")[:100] or None,
+            "description": (description or "")[:255],
+            "ip_address": request.remote_addr if has_request_context() else None,
+            "created_at": datetime.utcnow(),
+        }
     )
-    db.session.add(log)
-    db.session.commit()
+
+
+class CountCache:
+    """Short-lived cache of ``COUNT(*)`` results keyed by the compiled query signature."""
+
+    def __init__(self) -> None:
+        self._entries: dict[Any, tuple[float, tuple[int, bool]]] = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key: Any, compute: Callable[[], tuple[int, bool]], ttl: float) -> tuple[int, bool]:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = compute()
+        with self._lock:
+            if len(self._entries) > 1024:
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+            self._entries[key] = (now + ttl, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+count_cache = CountCache()
+
+
+def query_signature(query) -> str:
+    compiled = query.statement.compile(dialect=db.session.get_bind().dialect)
+    return f"{compiled}|{sorted(compiled.params.items())!r}"
+
+
+def cached_count(query, approximate: bool = False) -> tuple[int, bool]:
+    """Return ``(total, is_estimate)`` for ``query``, cached for ``COUNT_CACHE_TTL`` seconds.
+
+    With ``approximate`` the count stops at ``COUNT_APPROXIMATE_LIMIT`` rows and
+    ``is_estimate`` is true when the limit was reached.
+    """
+    query = query.order_by(None)
+    limit = current_app.config.get("COUNT_APPROXIMATE_LIMIT", 10000) if approximate else None
+
+    def compute() -> tuple[int, bool]:
+        if limit is None:
+            return query.count(), False
+        counted = db.session.query(func.count()).select_from(query.limit(limit + 1).subquery()).scalar() or 0
+        return min(counted, limit), counted > limit
+
+    key = (query_signature(query), limit)
+    return count_cache.get_or_compute(key, compute, current_app.config.get("COUNT_CACHE_TTL", 30))
 
 
 def paginate_query(query, page: int, per_page: int = 20):
     items = query.limit(per_page).offset((page - 1) * per_page).all()
-    total = query.order_by(None).count()
+    total, _ = cached_count(query)
     return items, total
 
 
+@dataclass
+class KeysetPage:
+    items: list[Any]
+    total: int | None
+    total_is_estimate: bool
+    next_cursor: str | None
+    prev_cursor: str | None
+
+
+def _cursor_serializer() -> URLSafeSerializer:
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt="keyset-cursor")
+
+
+def _encode_cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_cursor_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(direction: str, values: Sequence[Any]) -> str:
+    return _cursor_serializer().dumps([direction, [_encode_cursor_value(value) for value in values]])
+
+
+def decode_cursor(token: str | None) -> tuple[str, list[Any]] | None:
+    if not token:
+        return None
+    try:
+        direction, values = _cursor_serializer().loads(token)
+    except (BadSignature, ValueError, TypeError):
+        return None
+    return direction, [_decode_cursor_value(value) for value in values]
+
+
+def _seek_condition(columns: Sequence[Any], values: Sequence[Any], greater: bool):
+    clauses = []
+    for index, column in enumerate(columns):
+        equal_prefix = [columns[i] == values[i] for i in range(index)]
+        step = column > values[index] if greater else column < values[index]
+        clauses.append(and_(*equal_prefix, step))
+    return or_(*clauses)
+
+
+def keyset_paginate(
+    query,
+    sort_columns: Sequence[Any],
+    cursor: str | None = None,
+    per_page: int = 20,
+    descending: bool = False,
+    with_total: bool = True,
+    approximate: bool = False,
+) -> KeysetPage:
+    """Seek-paginate ``query`` on ``sort_columns`` (which must form a unique key).
+
+    ``cursor`` is an opaque token from a previous page's ``next_cursor`` or
+    ``prev_cursor``; an invalid or missing token yields the first page.  All
+    columns are sorted in the same direction.  Rows must expose each sort
+    column as an attribute of the same name.
+    """
+    decoded = decode_cursor(cursor)
+    backwards = decoded is not None and decoded[0] == "prev"
+    ascending = descending == backwards
+    total, total_is_estimate = cached_count(query, approximate=approximate) if with_total else (None, False)
+
+    paged = query.order_by(None)
+    if decoded is not None:
+        paged = paged.filter(_seek_condition(sort_columns, decoded[1], greater=ascending))
+    paged = paged.order_by(*(column.asc() if ascending else column.desc() for column in sort_columns))
+    rows = paged.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = decoded is not None if backwards else has_more
+    has_prev = has_more if backwards else decoded is not None
+
+    def key_of(row) -> list[Any]:
+        return [getattr(row, column.key) for column in sort_columns]
+
+    return KeysetPage(
+        items=rows,
+        total=total,
+        total_is_estimate=total_is_estimate,
+        next_cursor=encode_cursor("next", key_of(rows[-1])) if rows and has_next else None,
+        prev_cursor=encode_cursor("prev", key_of(rows[0])) if rows and has_prev else None,
+    )
+
+
+def bulk_insert_missing(model, rows: list[dict[str, Any]], key_columns: Sequence[str]) -> int:
+    """Insert the ``rows`` whose natural key does not exist yet; return how many were inserted.
+
+    Uses ``INSERT IGNORE`` on MySQL and ``ON CONFLICT DO NOTHING`` on
+    SQLite/PostgreSQL, so a row another transaction inserted first is left
+    as it is; other dialects fall back to a plain multi-row insert.
+    """
+    if not rows:
+        return 0
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = insert(table).prefix_with("IGNORE")
+    elif dialect in {"sqlite", "postgresql"}:
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+        stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=list(key_columns))
+    else:
+        stmt = insert(table)
+    return db.session.execute(stmt, rows).rowcount
+
+
+def upsert_grade_scores(course_id: int, term: str, assessment_type: str, scores: dict[int, float]) -> dict[int, str]:
+    """Save ``{student_id: score}`` for one course/term/assessment.
+
+    Returns ``{student_id: "created" | "updated" | "unchanged"}``.
+
+    Existing records are fetched in a single query and only new or changed
+    scores are written: one bulk update by primary key plus one bulk insert
+    for new rows.  The bulk statements bypass the unit of work, so the
+    grade_aggregates deltas are applied here, in the same transaction.  When
+    another save inserted some of the same keys first, those rows are
+    overwritten with ``scores`` and their buckets recomputed instead.
+    """
+    if not scores:
+        return {}
+    existing = dict(
+        db.session.query(GradeRecord.student_id, GradeRecord)
+        .filter(
+            GradeRecord.course_id == course_id,
+            GradeRecord.term == term,
+            GradeRecord.assessment_type == assessment_type,
+            GradeRecord.student_id.in_(list(scores)),
+        )
+        .all()
+    )
+    class_ids = dict(db.session.query(Student.id, Student.class_id).filter(Student.id.in_(list(scores))).all())
+    deltas = GradeDeltas()
+    now = datetime.utcnow()
+    inserts: list[dict[str, Any]] = []
+    updates: list[dict[str, Any]] = []
+    statuses: dict[int, str] = {}
+    for student_id, score in scores.items():
+        record = existing.get(student_id)
+        key = aggregate_key(class_ids.get(student_id), course_id, term, assessment_type)
+        statuses[student_id] = "unchanged"
+        if record is None:
+            statuses[student_id] = "created"
+            deltas.add(key, score)
+            inserts.append(
+                {
+                    "student_id": student_id,
+                    "course_id": course_id,
+                    "term": term,
+                    "assessment_type": assessment_type,
+                    "score": score,
+                    "recorded_at": now,
+                }
+            )
+        elif record.score != score:
+            statuses[student_id] = "updated"
+            deltas.remove(key, record.score)
+            deltas.add(key, score)
+            updates.append({"id": record.id, "score": score, "recorded_at": now})
+
+    if updates:
+        db.session.execute(update(GradeRecord), updates)
+    inserted = bulk_insert_missing(
+        GradeRecord, inserts, key_columns=("student_id", "course_id", "term", "assessment_type")
+    )
+    if inserted < len(inserts):
+        # Some keys were inserted concurrently and we cannot tell which: write
+        # our scores over them and let the buckets be recounted from the rows.
+        db.session.execute(
+            update(GradeRecord.__table__)
+            .where(
+                GradeRecord.student_id == bindparam("k_student_id"),
+                GradeRecord.course_id == course_id,
+                GradeRecord.term == term,
+                GradeRecord.assessment_type == assessment_type,
+            )
+            .values(score=bindparam("k_score"), recorded_at=now),
+            [{"k_student_id": row["student_id"], "k_score": row["score"]} for row in inserts],
+        )
+        deltas.recompute.update(
+            aggregate_key(class_ids.get(row["student_id"]), course_id, term, assessment_type) for row in inserts
+        )
+    apply_grade_deltas(db.session.connection(), deltas)
+    return statuses
+
+
+def save_attendance_records(
+    course_id: int | None,
+    record_date,
+    entries: dict[int, tuple[str, str | None]],
+    existing: dict[int, AttendanceRecord],
+) -> int:
+    """Write ``{student_id: (status, remarks)}`` for one course/date; return the number of rows written.
+
+    ``existing`` is the caller's already-loaded ``{student_id: record}`` map for
+    the same course and date.  Unchanged rows are skipped; changed rows are
+    bulk-updated by primary key and new rows go through one bulk insert.
+    Both bypass the unit of work, so the ``attendance_daily`` deltas are
+    applied here.  When another save inserted some of the same keys first,
+    those rows are overwritten and the day's rollup rows recounted instead.
+    """
+    inserts: list[dict[str, Any]] = []
+    updates: list[dict[str, Any]] = []
+    class_ids = dict(
+        db.session.query(Student.id, Student.class_id).filter(Student.id.in_(list(entries))).all()
+    )
+    deltas: Counter = Counter()
+    for student_id, (status, remarks) in entries.items():
+        record = existing.get(student_id)
+        if record is not None and record.status != status:
+            deltas[daily_key(record_date, class_ids.get(student_id), course_id, record.status)] -= 1
+            deltas[daily_key(record_date, class_ids.get(student_id), course_id, status)] += 1
+        if record is None:
+            deltas[daily_key(record_date, class_ids.get(student_id), course_id, status)] += 1
+            inserts.append(
+                {
+                    "student_id": student_id,
+                    "course_id": course_id,
+                    "record_date": record_date,
+                    "status": status,
+                    "remarks": remarks,
+                }
+            )
+        elif record.status != status or (record.remarks or "") != (remarks or ""):
+            updates.append({"id": record.id, "status": status, "remarks": remarks})
+
+    if updates:
+        db.session.execute(update(AttendanceRecord), updates)
+    inserted = bulk_insert_missing(AttendanceRecord, inserts, key_columns=("student_id", "course_key", "record_date"))
+    apply_attendance_deltas(db.session.connection(), deltas)
+    if inserted < len(inserts):
+        table = AttendanceRecord.__table__
+        db.session.execute(
+            update(table)
+            .where(
+                table.c.student_id == bindparam("k_student_id"),
+                table.c.course_key == (course_id or 0),
+                table.c.record_date == record_date,
+            )
+            .values(status=bindparam("k_status"), remarks=bindparam("k_remarks")),
+            [
+                {"k_student_id": row["student_id"], "k_status": row["status"], "k_remarks": row["remarks"]}
+                for row in inserts
+            ],
+        )
+        recount_attendance(
+            db.session.connection(), record_date, course_id, {class_ids.get(row["student_id"]) for row in inserts}
+        )
+    return len(inserts) + len(updates)
+
+
 def ensure_roles_exist(role_names: list[str]) -> None:
     for role_name in role_names:
         if not Role.query.filter_by(name=role_name).first():
@@ -115,63 +507,251 @@ def flash_form_errors(errors: dict[str, list[str]]) -> None:
             flash(message, "danger")
 
 
-def import_students_from_excel(file_path: str) -> list[dict[str, Any]]:
-    workbook = load_workbook(filename=file_path)
-    sheet = workbook.active
-    students: list[dict[str, Any]] = []
-    headers = [cell.value for cell in next(sheet.iter_rows(min_row=1, max_row=1))]
-    header_index = {header: index for index, header in enumerate(headers)}
+STUDENT_IMPORT_FIELDS = ("student_number", "name", "gender", "date_of_birth", "class_name", "email", "phone", "address")
+
+
+def import_students_from_excel(file_path: str) -> Iterator[tuple[int, dict[str, Any]]]:
+    """Stream ``(row_number, row)`` pairs from a student workbook opened in read-only mode.
+
+    The header row is validated eagerly so a bad template raises ``ValueError``
+    before any row is consumed.
+    """
+    workbook = load_workbook(filename=file_path, read_only=True, data_only=True)
+    rows = workbook.active.iter_rows(values_only=True)
+    headers = [str(header).strip() if header is not None else None for header in next(rows, ())]
+    header_index = {header: index for index, header in enumerate(headers) if header}
     required_fields = {"student_number", "name", "gender", "date_of_birth", "class_name", "email", "phone"}
-    missing_fields = required_fields - set(headers)
+    missing_fields = required_fields - set(header_index)
     if missing_fields:
-        raise ValueError(f"缺少必填列: {', '.join(missing_fields)}")
-    for row in sheet.iter_rows(min_row=2, values_only=True):
-        if not row or not any(row):
-            continue
-        student = {
-            "student_number": row[header_index["student_number"]],
-            "name": row[header_index["name"]],
-            "gender": row[header_index["gender"]],
-            "date_of_birth": row[header_index["date_of_birth"]],
-            "class_name": row[header_index["class_name"]],
-            "email": row[header_index["email"]],
-            "phone": row[header_index["phone"]],
-            "address": row[header_index.get("address", -1)] if header_index.get("address") is not None else "",
-        }
-        students.append(student)
-    return students
-
-
-def export_students_to_excel(rows: Iterable[dict[str, Any]]) -> BytesIO:
-    workbook = Workbook()
-    sheet = workbook.active
-    headers = [
-        "student_number",
-        "name",
-        "gender",
-        "date_of_birth",
-        "class_name",
-        "email",
-        "phone",
-        "address",
-    ]
-    sheet.append(headers)
+        workbook.close()
+        raise ValueError(f"缺少必填列: {', '.join(sorted(missing_fields))}")
+
+    def generate() -> Iterator[tuple[int, dict[str, Any]]]:
+        try:
+            for row_number, row in enumerate(rows, start=2):
+                if not row or not any(value not in (None, "") for value in row):
+                    continue
+                yield row_number, {
+                    field: row[header_index[field]] if header_index.get(field, len(row)) < len(row) else None
+                    for field in STUDENT_IMPORT_FIELDS
+                }
+        finally:
+            workbook.close()
+
+    return generate()
+
+
+def _clean_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _validate_student_row(
+    row: dict[str, Any], existing_numbers: set[str], class_ids: dict[str, int]
+) -> tuple[dict[str, Any] | None, str | None]:
+    values = {field: _clean_cell(row.get(field)) for field in STUDENT_IMPORT_FIELDS if field != "date_of_birth"}
+    if not values["student_number"]:
+        return None, "学号不能为空"
+    if values["student_number"] in existing_numbers:
+        return None, "学号已存在"
+    for field, label in (("name", "姓名"), ("gender", "性别"), ("email", "邮箱"), ("phone", "联系电话")):
+        if not values[field]:
+            return None, f"{label}不能为空"
+
+    dob_value = row.get("date_of_birth")
+    if isinstance(dob_value, datetime):
+        date_of_birth = dob_value.date()
+    elif isinstance(dob_value, date):
+        date_of_birth = dob_value
+    else:
+        try:
+            date_of_birth = datetime.strptime(_clean_cell(dob_value), "%Y-%m-%d").date()
+        except ValueError:
+            return None, "出生日期格式不正确，应为 YYYY-MM-DD"
+
+    return {
+        "student_number": values["student_number"],
+        "name": values["name"],
+        "gender": values["gender"],
+        "date_of_birth": date_of_birth,
+        "class_id": class_ids.get(values["class_name"]),
+        "email": values["email"],
+        "phone": values["phone"],
+        "address": values["address"] or None,
+        "enrollment_date": date.today(),
+    }, None
+
+
+def run_student_import(
+    file_path: str,
+    dry_run: bool = False,
+    chunk_size: int = 500,
+    on_chunk: Callable[[int], None] | None = None,
+) -> dict[str, Any]:
+    """Validate and insert students from ``file_path`` chunk by chunk.
+
+    Existing student numbers and the classroom name map are fetched once up
+    front; each chunk of valid rows is written with one multi-row insert and
+    committed.  With ``dry_run`` nothing is written.  Rejected rows are
+    collected into an error-report workbook whose file name is returned as
+    ``report``.  ``on_chunk`` is called with the number of rows processed so
+    far after every chunk.
+    """
+    rows = import_students_from_excel(file_path)
+    existing_numbers = {number for (number,) in db.session.query(Student.student_number)}
+    class_ids = dict(db.session.query(Classroom.name, Classroom.id).all())
+
+    accepted = 0
+    processed = 0
+    rejected: list[tuple[int, dict[str, Any], str]] = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        valid_rows = []
+        for row_number, row in chunk:
+            values, error = _validate_student_row(row, existing_numbers, class_ids)
+            if error:
+                rejected.append((row_number, row, error))
+                continue
+            existing_numbers.add(values["student_number"])
+            valid_rows.append(values)
+        if valid_rows and not dry_run:
+            db.session.execute(insert(Student), valid_rows)
+            db.session.commit()
+        accepted += len(valid_rows)
+        processed += len(chunk)
+        if on_chunk is not None:
+            on_chunk(processed)
+
+    report = write_import_error_report(rejected) if rejected else None
+    return {"accepted": accepted, "rejected": len(rejected), "report": report, "dry_run": dry_run}
+
+
+def get_import_report_path() -> Path:
+    # Reports repeat the rejected rows, so they stay outside the static tree
+    # and are only served through the permission-checked download view.
+    report_path = Path(current_app.config["IMPORT_REPORT_FOLDER"])
+    report_path.mkdir(parents=True, exist_ok=True)
+    return report_path
+
+
+def write_import_error_report(rejected: Iterable[tuple[int, dict[str, Any], str]]) -> str:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["row_number", "error", *STUDENT_IMPORT_FIELDS])
+    for row_number, row, error in rejected:
+        sheet.append([row_number, error, *(row.get(field) for field in STUDENT_IMPORT_FIELDS)])
+    filename = f"import_errors_{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}.xlsx"
+    workbook.save(get_import_report_path() / filename)
+    return filename
+
+
+STUDENT_EXPORT_HEADERS = [
+    "student_number",
+    "name",
+    "gender",
+    "date_of_birth",
+    "class_name",
+    "email",
+    "phone",
+    "address",
+]
+GRADE_EXPORT_HEADERS = ["student_number", "student_name", "course", "term", "assessment_type", "score", "recorded_at"]
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", None),
+    "csv": ("text/csv", ","),
+    "tsv": ("text/tab-separated-values", "\t"),
+}
+
+
+def write_excel_export(headers: Sequence[str], rows: Iterable[Sequence[Any]], target: str | Path | None = None) -> IO[bytes] | None:
+    """Write rows into a write-only workbook.
+
+    Saves to ``target`` when given; otherwise returns a rewound temporary file.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(headers))
     for row in rows:
-        sheet.append([row.get(header, "") for header in headers])
-    stream = BytesIO()
+        sheet.append(list(row))
+    if target is not None:
+        workbook.save(target)
+        return None
+    stream = tempfile.TemporaryFile()
     workbook.save(stream)
     stream.seek(0)
     return stream
 
 
-def export_grades_to_excel(rows: Iterable[dict[str, Any]]) -> BytesIO:
-    workbook = Workbook()
-    sheet = workbook.active
-    headers = ["student_number", "student_name", "course", "term", "assessment_type", "score", "recorded_at"]
-    sheet.append(headers)
+def iter_delimited_export(
+    headers: Sequence[str], rows: Iterable[Sequence[Any]], delimiter: str = ",", batch_size: int = 1000
+) -> Iterator[str]:
+    """Yield CSV/TSV text in batches of ``batch_size`` rows (UTF-8 BOM first so Excel detects the encoding)."""
+    buffer = StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter)
+    buffer.write("\ufeff")
+    writer.writerow(headers)
+    pending = 0
     for row in rows:
-        sheet.append([row.get(header, "") for header in headers])
-    stream = BytesIO()
-    workbook.save(stream)
-    stream.seek(0)
-    return stream
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def iter_ndjson(rows: Iterable[dict[str, Any]], batch_size: int = 1000) -> Iterator[str]:
+    """Yield newline-delimited JSON, ``batch_size`` rows per chunk."""
+    lines: list[str] = []
+    for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False, default=_json_default))
+        if len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def ndjson_response(rows: Iterable[dict[str, Any]]) -> Response:
+    """Stream ``rows`` as ``application/x-ndjson``; pass a lazy iterable to keep memory bounded."""
+    return Response(stream_with_context(iter_ndjson(rows)), mimetype="application/x-ndjson")
+
+
+def write_export_file(headers: Sequence[str], rows: Iterable[Sequence[Any]], target: str | Path, fmt: str = "xlsx") -> None:
+    _, delimiter = EXPORT_FORMATS.get(fmt, EXPORT_FORMATS["xlsx"])
+    if delimiter is None:
+        write_excel_export(headers, rows, target)
+        return
+    with open(target, "w", encoding="utf-8", newline="") as handle:
+        for chunk in iter_delimited_export(headers, rows, delimiter):
+            handle.write(chunk)
+
+
+def export_response(headers: Sequence[str], rows: Iterable[Sequence[Any]], basename: str, fmt: str = "xlsx") -> Response:
+    """Build a download response for ``rows`` in ``fmt`` (xlsx/csv/tsv) without holding them all in memory."""
+    mimetype, delimiter = EXPORT_FORMATS.get(fmt, EXPORT_FORMATS["xlsx"])
+    if delimiter is None:
+        return send_file(
+            write_excel_export(headers, rows),
+            as_attachment=True,
+            download_name=f"{basename}.xlsx",
+            mimetype=mimetype,
+        )
+    response = Response(stream_with_context(iter_delimited_export(headers, rows, delimiter)), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={basename}.{fmt}"
+    return response
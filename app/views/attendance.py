@@ -1,13 +1,14 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
+from sqlalchemy.orm import joinedload
 
 from ..extensions import db
-from ..models import AttendanceRecord, Classroom, Course, LeaveRequest, Student
-from ..utils import log_operation, permission_required
+from ..models import AttendanceDaily, AttendanceRecord, Classroom, Course, LeaveRequest, Student
+from ..utils import keyset_paginate, log_operation, permission_required, save_attendance_records
 
 attendance_bp = Blueprint("attendance", __name__, url_prefix="/attendance")
 
@@ -32,34 +33,19 @@ def check_attendance():
     except ValueError:
         record_date = datetime.utcnow().date()
 
-    if students and course_id:
+    if students:
         records = AttendanceRecord.query.filter_by(course_id=course_id, record_date=record_date).all()
         record_map = {record.student_id: record for record in records}
 
     if request.method == "POST" and request.form.get("action") == "save":
-        record_date = datetime.strptime(record_date_raw, "%Y-%m-%d").date()
+        entries: dict[int, tuple[str, str | None]] = {}
         for student in students:
             status = request.form.get(f"status_{student.id}")
             remarks = request.form.get(f"remark_{student.id}")
             if not status:
                 continue
-            record = AttendanceRecord.query.filter_by(
-                student_id=student.id,
-                course_id=course_id,
-                record_date=record_date,
-            ).first()
-            if record:
-                record.status = status
-                record.remarks = remarks
-            else:
-                record = AttendanceRecord(
-                    student_id=student.id,
-                    course_id=course_id,
-                    record_date=record_date,
-                    status=status,
-                    remarks=remarks,
-                )
-                db.session.add(record)
+            entries[student.id] = (status, remarks)
+        save_attendance_records(course_id, record_date, entries, record_map)
         db.session.commit()
         log_operation(current_user.id, "update", "attendance", f"记录考勤 {record_date}")
         flash("考勤记录已保存", "success")
@@ -81,38 +67,62 @@ def check_attendance():
 @login_required
 @permission_required("attendance.manage")
 def statistics():
-    summary = (
-        db.session.query(
-            AttendanceRecord.status,
-            db.func.count(AttendanceRecord.id),
-        )
-        .group_by(AttendanceRecord.status)
-        .all()
+    # Served from the attendance_daily rollup: cost grows with the number of
+    # days × classes × courses in range, not with the number of records.
+    today = date.today()
+    start_date = _parse_date(request.args.get("start_date"), today - timedelta(days=29))
+    end_date = _parse_date(request.args.get("end_date"), today)
+    if start_date > end_date:
+        start_date, end_date = end_date, start_date
+    class_id = request.args.get("class_id", type=int)
+    course_id = request.args.get("course_id", type=int)
+
+    query = db.session.query(AttendanceDaily).filter(
+        AttendanceDaily.record_date >= start_date, AttendanceDaily.record_date <= end_date
     )
+    if class_id:
+        query = query.filter(AttendanceDaily.class_id == class_id)
+    if course_id:
+        query = query.filter(AttendanceDaily.course_id == course_id)
+    rollup = query.subquery()
 
+    total = db.func.sum(rollup.c.record_count)
+    summary = (
+        db.session.query(rollup.c.status, total).group_by(rollup.c.status).order_by(rollup.c.status.asc()).all()
+    )
     class_summary = (
-        db.session.query(
-            Classroom.name,
-            AttendanceRecord.status,
-            db.func.count(AttendanceRecord.id),
-        )
-        .join(Student, Student.id == AttendanceRecord.student_id)
-        .join(Classroom, Classroom.id == Student.class_id)
-        .group_by(Classroom.name, AttendanceRecord.status)
+        db.session.query(Classroom.name, rollup.c.status, total)
+        .join(Classroom, Classroom.id == rollup.c.class_id)
+        .group_by(Classroom.name, rollup.c.status)
+        .order_by(Classroom.name.asc())
         .all()
     )
-
     class_stat_map = {}
     for class_name, status, count in class_summary:
-        class_stat_map.setdefault(class_name, {}).update({status: count})
+        class_stat_map.setdefault(class_name, {}).update({status: int(count)})
 
     return render_template(
         "attendance/statistics.html",
-        summary=summary,
+        summary=[(status, int(count)) for status, count in summary],
         class_stat_map=class_stat_map,
+        classes=Classroom.query.order_by(Classroom.name.asc()).all(),
+        courses=Course.query.order_by(Course.name.asc()).all(),
+        filters={
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "class_id": class_id,
+            "course_id": course_id,
+        },
     )
 
 
+def _parse_date(value: str | None, default: date) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else default
+    except ValueError:
+        return default
+
+
 @attendance_bp.route("/leaves", methods=["GET", "POST"])
 @login_required
 def leave_requests():
@@ -128,8 +138,16 @@ def leave_requests():
         flash("请假申请已处理", "success")
         return redirect(url_for("attendance.leave_requests"))
 
-    leaves = LeaveRequest.query.order_by(LeaveRequest.created_at.desc()).all()
-    return render_template("attendance/leaves.html", leaves=leaves)
+    query = LeaveRequest.query.options(joinedload(LeaveRequest.student), joinedload(LeaveRequest.approver))
+    page = keyset_paginate(
+        query,
+        [LeaveRequest.created_at, LeaveRequest.id],
+        request.args.get("cursor"),
+        per_page=30,
+        descending=True,
+        approximate=True,
+    )
+    return render_template("attendance/leaves.html", leaves=page.items, page=page)
 
 
 @attendance_bp.route("/leaves/new", methods=["GET", "POST"])
@@ -1,13 +1,25 @@
 from __future__ import annotations
 
-from collections import defaultdict
-
-from flask import Blueprint, flash, redirect, render_template, request, send_file, url_for
+from flask import Blueprint, flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required
+from sqlalchemy.orm import contains_eager
 
+from ..analytics import DEFAULT_GROUP_BY, score_distribution, term_trends
 from ..extensions import db
-from ..models import Classroom, Course, GradeRecord, Student
-from ..utils import export_grades_to_excel, log_operation, permission_required
+from ..models import Classroom, Course, GradeAggregate, GradeRecord, Student
+from ..jobs import JobContext, job_handler, submit_job
+from ..search import get_search_backend
+from ..system_settings import get_setting
+from ..utils import (
+    EXPORT_FORMATS,
+    GRADE_EXPORT_HEADERS,
+    export_response,
+    keyset_paginate,
+    log_operation,
+    permission_required,
+    upsert_grade_scores,
+    write_export_file,
+)
 
 
 grades_bp = Blueprint("grades", __name__, url_prefix="/grades")
@@ -22,7 +34,7 @@ def entry():
 
     selected_class_id = request.values.get("class_id", type=int)
     selected_course_id = request.values.get("course_id", type=int)
-    term = request.values.get("term", "2023-2024")
+    term = request.values.get("term") or get_setting("current_term")
     assessment_type = request.values.get("assessment_type", "期末")
 
     students = []
@@ -30,44 +42,41 @@ def entry():
         students = Student.query.filter_by(class_id=selected_class_id).order_by(Student.student_number.asc()).all()
 
     if request.method == "POST" and request.form.get("action") == "save":
+        scores: dict[int, float] = {}
         for student in students:
             field_name = f"score_{student.id}"
             score_value = request.form.get(field_name)
             if score_value is None:
                 continue
             try:
-                score = float(score_value)
+                scores[student.id] = float(score_value)
             except ValueError:
                 flash(f"学生 {student.name} 的成绩格式不正确", "danger")
                 continue
 
-            record = GradeRecord.query.filter_by(
-                student_id=student.id,
-                course_id=selected_course_id,
-                term=term,
-                assessment_type=assessment_type,
-            ).first()
-            if record:
-                record.score = score
-            else:
-                record = GradeRecord(
-                    student_id=student.id,
-                    course_id=selected_course_id,
-                    term=term,
-                    assessment_type=assessment_type,
-                    score=score,
-                )
-                db.session.add(record)
+        if selected_course_id:
+            upsert_grade_scores(selected_course_id, term, assessment_type, scores)
         db.session.commit()
         log_operation(current_user.id, "update", "grade", f"录入成绩 课程 {selected_course_id}")
         flash("成绩已保存", "success")
         return redirect(url_for("grades.entry", class_id=selected_class_id, course_id=selected_course_id, term=term, assessment_type=assessment_type))
 
+    record_map = {}
+    if students and selected_course_id:
+        records = GradeRecord.query.filter(
+            GradeRecord.course_id == selected_course_id,
+            GradeRecord.term == term,
+            GradeRecord.assessment_type == assessment_type,
+            GradeRecord.student_id.in_([student.id for student in students]),
+        ).all()
+        record_map = {record.student_id: record for record in records}
+
     return render_template(
         "grades/entry.html",
         classes=classes,
         courses=courses,
         students=students,
+        record_map=record_map,
         selected_class_id=selected_class_id,
         selected_course_id=selected_course_id,
         term=term,
@@ -87,26 +96,46 @@ def search():
     term = request.args.get("term", "")
     keyword = request.args.get("q", "").strip()
 
-    query = GradeRecord.query.join(Student).join(Course)
+    query = GradeRecord.query.join(Student).join(Course).options(
+        contains_eager(GradeRecord.student), contains_eager(GradeRecord.course)
+    )
     if selected_class_id:
         query = query.join(Classroom, Student.class_id == Classroom.id).filter(Classroom.id == selected_class_id)
     if selected_course_id:
         query = query.filter(GradeRecord.course_id == selected_course_id)
     if term:
         query = query.filter(GradeRecord.term == term)
+    sort_columns = [GradeRecord.recorded_at, GradeRecord.id]
     if keyword:
-        like_pattern = f"%{keyword}%"
-        query = query.filter(
-            (Student.name.ilike(like_pattern))
-            | (Student.student_number.ilike(like_pattern))
-            | (Course.name.ilike(like_pattern))
+        # A record matches through its student, its course or both; both scores add up.
+        backend = get_search_backend()
+        student_matches = backend.student_matches(keyword)
+        course_matches = backend.course_matches(keyword)
+        relevance = (
+            db.func.coalesce(student_matches.c.score, 0) + db.func.coalesce(course_matches.c.score, 0)
+        ).label("relevance")
+        query = (
+            query.outerjoin(student_matches, student_matches.c.id == GradeRecord.student_id)
+            .outerjoin(course_matches, course_matches.c.id == GradeRecord.course_id)
+            .filter(db.or_(student_matches.c.id.isnot(None), course_matches.c.id.isnot(None)))
+            .add_columns(relevance, GradeRecord.id)
         )
+        sort_columns = [relevance, GradeRecord.id]
 
-    results = query.order_by(GradeRecord.recorded_at.desc()).all()
+    page = keyset_paginate(
+        query,
+        sort_columns,
+        request.args.get("cursor"),
+        per_page=50,
+        descending=True,
+        approximate=True,
+    )
 
     return render_template(
         "grades/search.html",
-        results=results,
+        results=[row.GradeRecord for row in page.items] if keyword else page.items,
+        page=page,
+        page_args={key: value for key, value in request.args.items() if key != "cursor" and value},
         classes=classes,
         courses=courses,
         selected_class_id=selected_class_id,
@@ -120,9 +149,15 @@ def search():
 @login_required
 @permission_required("grades.manage")
 def statistics():
+    # Served from the grade_aggregates rollup: cost grows with the number of
+    # class/course/term buckets, not with the number of grade records.
     course_stats_raw = (
-        db.session.query(Course.name, db.func.avg(GradeRecord.score), db.func.max(GradeRecord.score))
-        .join(GradeRecord, GradeRecord.course_id == Course.id)
+        db.session.query(
+            Course.name,
+            db.func.sum(GradeAggregate.score_sum) / db.func.sum(GradeAggregate.score_count),
+            db.func.max(GradeAggregate.max_score),
+        )
+        .join(GradeAggregate, GradeAggregate.course_id == Course.id)
         .group_by(Course.name)
         .order_by(Course.name.asc())
         .all()
@@ -131,21 +166,16 @@ def statistics():
         (name, float(avg or 0), float(max_score or 0)) for name, avg, max_score in course_stats_raw
     ]
 
-    class_stats = defaultdict(list)
-    records = (
-        db.session.query(Classroom.name, GradeRecord.score)
-        .join(Student, Student.id == GradeRecord.student_id)
-        .join(Classroom, Classroom.id == Student.class_id)
+    class_averages_raw = (
+        db.session.query(
+            Classroom.name, db.func.sum(GradeAggregate.score_sum) / db.func.sum(GradeAggregate.score_count)
+        )
+        .join(GradeAggregate, GradeAggregate.class_id == Classroom.id)
+        .group_by(Classroom.name)
+        .order_by(Classroom.name.asc())
         .all()
     )
-    for class_name, score in records:
-        class_stats[class_name].append(score)
-
-    class_averages = [
-        (class_name, float(sum(scores) / len(scores)) if scores else 0.0)
-        for class_name, scores in class_stats.items()
-    ]
-    class_averages.sort(key=lambda item: item[0])
+    class_averages = [(class_name, float(avg or 0)) for class_name, avg in class_averages_raw]
 
     return render_template(
         "grades/statistics.html",
@@ -154,10 +184,36 @@ def statistics():
     )
 
 
-@grades_bp.route("/export")
+def _analytics_params() -> tuple[tuple[str, ...], dict]:
+    filters = {
+        "class_id": request.args.get("class_id", type=int),
+        "course_id": request.args.get("course_id", type=int),
+        "term": request.args.get("term", "").strip(),
+        "assessment_type": request.args.get("assessment_type", "").strip(),
+    }
+    group_by = ("course", "class", "term", "assessment_type") if request.args.get("by_class") else DEFAULT_GROUP_BY
+    return group_by, filters
+
+
+@grades_bp.route("/analytics")
 @login_required
-@permission_required("grades.export")
-def export():
+@permission_required("grades.manage")
+def analytics():
+    group_by, filters = _analytics_params()
+    distribution = score_distribution(group_by, filters)
+    return render_template(
+        "grades/analytics.html",
+        distribution=distribution,
+        trends=term_trends(distribution),
+        filters=filters,
+        by_class="class" in group_by,
+        classes=Classroom.query.order_by(Classroom.name.asc()).all(),
+        courses=Course.query.order_by(Course.name.asc()).all(),
+        pass_mark=get_setting("grade_pass_mark"),
+    )
+
+
+def _grade_export_rows():
     records = (
         db.session.query(
             Student.student_number,
@@ -170,25 +226,43 @@ def export():
         )
         .join(Student, Student.id == GradeRecord.student_id)
         .join(Course, Course.id == GradeRecord.course_id)
-        .all()
+        .order_by(GradeRecord.id.asc())
+        .execution_options(yield_per=1000)
     )
-    rows = []
-    for student_number, student_name, course_name, term, assessment_type, score, recorded_at in records:
-        rows.append(
-            {
-                "student_number": student_number,
-                "student_name": student_name,
-                "course": course_name,
-                "term": term,
-                "assessment_type": assessment_type,
-                "score": score,
-                "recorded_at": recorded_at.strftime("%Y-%m-%d %H:%M"),
-            }
+    return (
+        (
+            student_number,
+            student_name,
+            course_name,
+            term,
+            assessment_type,
+            score,
+            recorded_at.strftime("%Y-%m-%d %H:%M") if recorded_at else "",
         )
-    stream = export_grades_to_excel(rows)
-    return send_file(
-        stream,
-        as_attachment=True,
-        download_name="grades.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        for student_number, student_name, course_name, term, assessment_type, score, recorded_at in records
     )
+
+
+@grades_bp.route("/export", methods=["GET", "POST"])
+@login_required
+@permission_required("grades.export")
+def export():
+    fmt = request.values.get("format", "xlsx")
+    if request.method == "POST":
+        try:
+            job = submit_job("grades.export", {"format": fmt}, current_user.id)
+        except ValueError as exc:
+            flash(str(exc), "danger")
+            return redirect(url_for("grades.search"))
+        flash("导出任务已提交，完成后可下载", "info")
+        return redirect(url_for("jobs.job_detail", job_id=job.id))
+    return export_response(GRADE_EXPORT_HEADERS, _grade_export_rows(), "grades", fmt)
+
+
+@job_handler("grades.export", permission="grades.export")
+def export_grades_job(context: JobContext) -> dict:
+    fmt = context.params.get("format", "xlsx")
+    total = db.session.query(db.func.count(GradeRecord.id)).scalar() or 0
+    target = context.result_path(f"grades.{fmt if fmt in EXPORT_FORMATS else 'xlsx'}")
+    write_export_file(GRADE_EXPORT_HEADERS, context.track(_grade_export_rows(), total), target, fmt)
+    return {"rows": total}
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from flask import Blueprint, Response, abort, flash, jsonify, redirect, render_template, request, send_file, url_for
+from flask_login import current_user, login_required
+
+from ..jobs import JOB_HANDLERS, cancel_job, submit_job
+from ..models import Job
+
+jobs_bp = Blueprint("jobs", __name__, url_prefix="/jobs")
+
+
+def _get_job_or_404(job_id: int) -> Job:
+    job = Job.query.get_or_404(job_id)
+    if job.created_by != current_user.id and not current_user.has_permission("settings.manage"):
+        abort(403)
+    return job
+
+
+def _job_payload(job: Job) -> dict:
+    payload = job.to_dict()
+    payload["status_url"] = url_for("jobs.job_status", job_id=job.id)
+    payload["download_url"] = url_for("jobs.download_result", job_id=job.id) if job.result_path else None
+    return payload
+
+
+@jobs_bp.route("/", methods=["POST"])
+@login_required
+def submit():
+    payload = request.get_json(silent=True) or {}
+    kind = payload.get("kind") or request.form.get("kind", "")
+    params = payload.get("params") or {}
+    spec = JOB_HANDLERS.get(kind)
+    if spec is None or not spec.submittable:
+        return jsonify({"error": f"不支持提交的任务类型: {kind}"}), 400
+    if spec.permission and not current_user.has_permission(spec.permission):
+        abort(403)
+    try:
+        job = submit_job(kind, params, current_user.id)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 429
+    return jsonify(_job_payload(job)), 202
+
+
+@jobs_bp.route("/<int:job_id>")
+@login_required
+def job_detail(job_id: int):
+    job = _get_job_or_404(job_id)
+    return render_template("jobs/detail.html", job=job)
+
+
+@jobs_bp.route("/<int:job_id>/status")
+@login_required
+def job_status(job_id: int):
+    return jsonify(_job_payload(_get_job_or_404(job_id)))
+
+
+@jobs_bp.route("/<int:job_id>/cancel", methods=["POST"])
+@login_required
+def cancel(job_id: int):
+    job = _get_job_or_404(job_id)
+    cancel_job(job)
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(_job_payload(job))
+    flash("已请求取消任务", "info")
+    return redirect(url_for("jobs.job_detail", job_id=job.id))
+
+
+@jobs_bp.route("/<int:job_id>/download")
+@login_required
+def download_result(job_id: int) -> Response:
+    job = _get_job_or_404(job_id)
+    if not job.result_path or not Path(job.result_path).exists():
+        abort(404)
+    return send_file(job.result_path, as_attachment=True, download_name=job.result_name)
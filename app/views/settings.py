@@ -1,17 +1,24 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 
 from flask import Blueprint, Response, flash, redirect, render_template, request, send_file, url_for
 from flask_login import current_user, login_required
 
+from ..backup import create_backup, read_manifest
 from ..extensions import db
-from ..models import DataBackup, OperationLog, Role, SystemSetting, User
+from ..jobs import JobContext, job_handler, submit_job
+from ..log_archive import LogFilters, explore_logs
+from ..models import DataBackup, Role, SystemSetting, User
+from ..operation_log import get_log_writer
+from ..system_settings import SETTINGS, parse_setting, settings_cache
 from ..utils import log_operation, permission_required
 
 settings_bp = Blueprint("settings", __name__, url_prefix="/settings")
 
+LOG_FLUSH_TIMEOUT = 2.0  # seconds the log page waits for the buffered writer
+
 
 @settings_bp.route("/users", methods=["GET", "POST"])
 @login_required
@@ -29,7 +36,7 @@ def manage_users():
             except (TypeError, ValueError):
                 continue
         user = User.query.get_or_404(user_id)
-        user.roles = [Role.query.get(role_id) for role_id in role_ids if Role.query.get(role_id)]
+        user.roles = Role.query.filter(Role.id.in_(role_ids)).all() if role_ids else []
         db.session.commit()
         log_operation(current_user.id, "update", "user_roles", f"更新用户 {user.username} 角色")
         flash("角色已更新", "success")
@@ -45,8 +52,16 @@ def parameters():
         key = request.form.get("key", "").strip()
         value = request.form.get("value", "")
         description = request.form.get("description", "").strip() or None
+        error = None
         if not key:
-            flash("参数键不能为空", "danger")
+            error = "参数键不能为空"
+        else:
+            try:
+                parse_setting(key, value)
+            except ValueError as exc:
+                error = f"参数 {key} 的值无效：{exc}"
+        if error:
+            flash(error, "danger")
         else:
             setting = SystemSetting.query.get(key)
             if setting:
@@ -60,35 +75,52 @@ def parameters():
         return redirect(url_for("settings.parameters"))
 
     settings = SystemSetting.query.order_by(SystemSetting.key.asc()).all()
-    return render_template("settings/parameters.html", settings=settings)
+    invalid_keys = set()
+    for setting in settings:
+        try:
+            parse_setting(setting.key, setting.value or "")
+        except ValueError:
+            invalid_keys.add(setting.key)
+    return render_template(
+        "settings/parameters.html",
+        settings=settings,
+        specs=SETTINGS,
+        effective=settings_cache.snapshot(),
+        invalid_keys=invalid_keys,
+    )
 
 
 @settings_bp.route("/backups", methods=["GET", "POST"])
 @login_required
 @permission_required("settings.manage")
 def backups():
-    backups_dir = Path("backups")
-    backups_dir.mkdir(exist_ok=True)
     if request.method == "POST":
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-        filename = f"backup_{timestamp}.sql"
-        file_path = backups_dir / filename
-        file_path.write_text("-- mock backup file --", encoding="utf-8")
-        backup = DataBackup(
-            filename=filename,
-            file_path=str(file_path),
-            created_by=request.form.get("user_id", type=int) or None,
-        )
-        db.session.add(backup)
-        db.session.commit()
-        log_operation(current_user.id, "create", "backup", filename)
-        flash("备份已创建", "success")
-        return redirect(url_for("settings.backups"))
+        incremental = request.form.get("mode") == "incremental"
+        try:
+            job = submit_job("settings.backup", {"incremental": incremental}, current_user.id)
+        except ValueError as exc:
+            flash(str(exc), "danger")
+            return redirect(url_for("settings.backups"))
+        flash("备份任务已提交，正在后台处理", "info")
+        return redirect(url_for("jobs.job_detail", job_id=job.id))
 
     backups_list = DataBackup.query.order_by(DataBackup.created_at.desc()).all()
     return render_template("settings/backups.html", backups=backups_list)
 
 
+@job_handler("settings.backup", permission="settings.manage", submittable=False)
+def backup_job(context: JobContext) -> dict:
+    def on_progress(table: str, rows: int, index: int, count: int) -> None:
+        context.check_cancelled()
+        context.update(progress=index * 100 // count, message=f"正在备份 {table}：{rows} 行")
+
+    backup = create_backup(bool(context.params.get("incremental")), context.user_id, on_progress)
+    context.result_file = Path(backup.file_path)
+    manifest = read_manifest(backup.file_path)
+    log_operation(context.user_id, "create", "backup", backup.filename)
+    return {"backup_id": backup.id, "mode": manifest["mode"], "rows": manifest["total_rows"]}
+
+
 @settings_bp.route("/backups/<int:backup_id>/download")
 @login_required
 @permission_required("settings.manage")
@@ -101,5 +133,37 @@ def download_backup(backup_id: int) -> Response:
 @login_required
 @permission_required("settings.manage")
 def logs():
-    logs_records = OperationLog.query.order_by(OperationLog.created_at.desc()).limit(200).all()
-    return render_template("settings/logs.html", logs=logs_records)
+    start_date = _parse_date(request.args.get("start_date"))
+    end_date = _parse_date(request.args.get("end_date"))
+    filters = LogFilters(
+        user_id=request.args.get("user_id", type=int),
+        action=request.args.get("action", "").strip() or None,
+        resource=request.args.get("resource", "").strip() or None,
+        start=start_date,
+        end=end_date + timedelta(days=1) if end_date else None,
+    )
+    # Entries still waiting in the buffered writer should show up here.
+    flushed = get_log_writer().flush(timeout=LOG_FLUSH_TIMEOUT)
+    page = explore_logs(filters, request.args.get("cursor"), per_page=50)
+    usernames = dict(
+        db.session.query(User.id, User.username).filter(
+            User.id.in_({row["user_id"] for row in page.items if row["user_id"]})
+        )
+    )
+    return render_template(
+        "settings/logs.html",
+        logs=page.items,
+        page=page,
+        page_args={key: value for key, value in request.args.items() if key != "cursor" and value},
+        usernames=usernames,
+        flushed=flushed,
+        users=User.query.order_by(User.username.asc()).all(),
+        filters=request.args,
+    )
+
+
+def _parse_date(value: str | None) -> datetime | None:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d") if value else None
+    except ValueError:
+        return None
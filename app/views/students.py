@@ -1,19 +1,38 @@
 from __future__ import annotations
 
 from datetime import datetime
-
-from flask import Blueprint, Response, flash, redirect, render_template, request, send_file, url_for
+from pathlib import Path
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    flash,
+    redirect,
+    render_template,
+    request,
+    send_from_directory,
+    url_for,
+)
 from flask_login import current_user, login_required
+from sqlalchemy.orm import joinedload
 
 from ..extensions import db
+from ..jobs import JobContext, job_handler, submit_job
 from ..models import Classroom, Student
+from ..search import get_search_backend
+from ..system_settings import PAGE_SIZE_CHOICES, get_setting
 from ..utils import (
-    export_students_to_excel,
-    import_students_from_excel,
+    EXPORT_FORMATS,
+    STUDENT_EXPORT_HEADERS,
+    export_response,
+    get_import_report_path,
+    keyset_paginate,
     log_operation,
-    paginate_query,
     permission_required,
+    run_student_import,
     save_uploaded_file,
+    write_export_file,
 )
 
 students_bp = Blueprint("students", __name__, url_prefix="/students")
@@ -23,34 +42,34 @@ students_bp = Blueprint("students", __name__, url_prefix="/students")
 @login_required
 @permission_required("students.manage")
 def list_students():
-    page = request.args.get("page", default=1, type=int)
-    per_page = request.args.get("per_page", default=15, type=int)
-    if per_page not in {10, 15, 20, 30, 50}:
-        per_page = 15
+    cursor = request.args.get("cursor")
+    per_page = request.args.get("per_page", type=int)
+    if per_page not in PAGE_SIZE_CHOICES:
+        per_page = get_setting("page_size")
     keyword = request.args.get("q", "").strip()
     class_id = request.args.get("class_id", type=int)
     gender = request.args.get("gender", "")
 
-    query = Student.query.order_by(Student.student_number.asc())
-    if keyword:
-        like_pattern = f"%{keyword}%"
-        query = query.filter(
-            (Student.name.ilike(like_pattern))
-            | (Student.student_number.ilike(like_pattern))
-            | (Student.email.ilike(like_pattern))
-        )
+    query = Student.query.options(joinedload(Student.classroom))
     if class_id:
-        query = query.filter_by(class_id=class_id)
+        query = query.filter(Student.class_id == class_id)
     if gender:
-        query = query.filter_by(gender=gender)
+        query = query.filter(Student.gender == gender)
 
-    students, total = paginate_query(query, page, per_page)
+    if keyword:
+        matches = get_search_backend().student_matches(keyword)
+        query = query.join(matches, matches.c.id == Student.id).add_columns(matches.c.score, matches.c.id)
+        page = keyset_paginate(query, [matches.c.score, matches.c.id], cursor, per_page, descending=True)
+        students = [row.Student for row in page.items]
+    else:
+        page = keyset_paginate(query, [Student.student_number], cursor, per_page)
+        students = page.items
     classes = Classroom.query.order_by(Classroom.name.asc()).all()
     return render_template(
         "students/list.html",
         students=students,
-        total=total,
         page=page,
+        page_args={key: value for key, value in request.args.items() if key != "cursor" and value},
         per_page=per_page,
         keyword=keyword,
         class_id=class_id,
@@ -224,32 +243,60 @@ def delete_student(student_id: int):
     return redirect(url_for("students.list_students"))
 
 
-@students_bp.route("/export")
+def _student_export_rows():
+    records = (
+        db.session.query(
+            Student.student_number,
+            Student.name,
+            Student.gender,
+            Student.date_of_birth,
+            Classroom.name,
+            Student.email,
+            Student.phone,
+            Student.address,
+        )
+        .outerjoin(Classroom, Classroom.id == Student.class_id)
+        .order_by(Student.student_number.asc())
+        .execution_options(yield_per=1000)
+    )
+    return (
+        (
+            student_number,
+            name,
+            gender,
+            date_of_birth.strftime("%Y-%m-%d"),
+            class_name or "",
+            email,
+            phone,
+            address or "",
+        )
+        for student_number, name, gender, date_of_birth, class_name, email, phone, address in records
+    )
+
+
+@students_bp.route("/export", methods=["GET", "POST"])
 @login_required
 @permission_required("students.export")
 def export_students() -> Response:
-    students = Student.query.all()
-    rows = []
-    for student in students:
-        rows.append(
-            {
-                "student_number": student.student_number,
-                "name": student.name,
-                "gender": student.gender,
-                "date_of_birth": student.date_of_birth.strftime("%Y-%m-%d"),
-                "class_name": student.classroom.name if student.classroom else "",
-                "email": student.email,
-                "phone": student.phone,
-                "address": student.address or "",
-            }
-        )
-    stream = export_students_to_excel(rows)
-    return send_file(
-        stream,
-        as_attachment=True,
-        download_name="students.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
+    fmt = request.values.get("format", "xlsx")
+    if request.method == "POST":
+        try:
+            job = submit_job("students.export", {"format": fmt}, current_user.id)
+        except ValueError as exc:
+            flash(str(exc), "danger")
+            return redirect(url_for("students.list_students"))
+        flash("导出任务已提交，完成后可下载", "info")
+        return redirect(url_for("jobs.job_detail", job_id=job.id))
+    return export_response(STUDENT_EXPORT_HEADERS, _student_export_rows(), "students", fmt)
+
+
+@job_handler("students.export", permission="students.export")
+def export_students_job(context: JobContext) -> dict:
+    fmt = context.params.get("format", "xlsx")
+    total = db.session.query(db.func.count(Student.id)).scalar() or 0
+    target = context.result_path(f"students.{fmt if fmt in EXPORT_FORMATS else 'xlsx'}")
+    write_export_file(STUDENT_EXPORT_HEADERS, context.track(_student_export_rows(), total), target, fmt)
+    return {"rows": total}
 
 
 @students_bp.route("/import", methods=["GET", "POST"])
@@ -262,42 +309,43 @@ def import_students():
             flash("请选择要上传的 Excel 文件", "danger")
             return render_template("students/import.html")
         stored_path = save_uploaded_file(file, subdir="imports")
+        params = {
+            "file_path": str(Path(current_app.static_folder) / stored_path),
+            "dry_run": bool(request.form.get("dry_run")),
+        }
         try:
-            imported_rows = import_students_from_excel(stored_path)
+            job = submit_job("students.import", params, current_user.id)
         except ValueError as exc:
             flash(str(exc), "danger")
             return render_template("students/import.html")
-
-        created = 0
-        for row in imported_rows:
-            if not row.get("student_number"):
-                continue
-            if Student.query.filter_by(student_number=row["student_number"]).first():
-                continue
-            classroom = Classroom.query.filter_by(name=row.get("class_name", "")).first()
-            dob_value = row.get("date_of_birth")
-            if isinstance(dob_value, datetime):
-                date_of_birth = dob_value.date()
-            else:
-                try:
-                    date_of_birth = datetime.strptime(str(dob_value), "%Y-%m-%d").date()
-                except ValueError:
-                    date_of_birth = datetime.utcnow().date()
-            student = Student(
-                student_number=str(row.get("student_number", "")).strip(),
-                name=str(row.get("name", "")).strip(),
-                gender=str(row.get("gender", "")).strip(),
-                date_of_birth=date_of_birth,
-                class_id=classroom.id if classroom else None,
-                email=str(row.get("email", "")).strip(),
-                phone=str(row.get("phone", "")).strip(),
-                address=str(row.get("address", "")).strip() or None,
-            )
-            db.session.add(student)
-            created += 1
-        db.session.commit()
-        log_operation(current_user.id, "import", "student", f"导入学生 {created} 条")
-        flash(f"成功导入 {created} 条学生信息", "success")
-        return redirect(url_for("students.list_students"))
+        flash("导入任务已提交，正在后台处理", "info")
+        return redirect(url_for("jobs.job_detail", job_id=job.id))
 
     return render_template("students/import.html")
+
+
+@job_handler("students.import", permission="students.import", submittable=False)
+def import_students_job(context: JobContext) -> dict:
+    def on_chunk(processed: int) -> None:
+        context.check_cancelled()
+        context.update(message=f"已处理 {processed} 行")
+
+    dry_run = bool(context.params.get("dry_run"))
+    result = run_student_import(
+        context.params["file_path"],
+        dry_run=dry_run,
+        chunk_size=current_app.config.get("IMPORT_CHUNK_SIZE", 500),
+        on_chunk=on_chunk,
+    )
+    if result["report"]:
+        context.result_file = get_import_report_path() / result["report"]
+    if not dry_run:
+        log_operation(context.user_id, "import", "student", f"导入学生 {result['accepted']} 条")
+    return result
+
+
+@students_bp.route("/import/reports/<path:filename>")
+@login_required
+@permission_required("students.import")
+def download_import_report(filename: str) -> Response:
+    return send_from_directory(get_import_report_path(), filename, as_attachment=True)
@@ -0,0 +1,111 @@
+"""Benchmark: saving a 60-student class in grades.entry, per-row vs bulk upsert.
+
+Usage::
+
+    python benchmarks/grade_entry_save.py
+
+Runs against a throwaway SQLite database (override with ``DATABASE_URL``) and
+reports the number of SQL statements and wall-clock latency of the legacy
+per-row loop and of ``upsert_grade_scores`` for a first save (all inserts)
+and a re-save where every score changed (all updates).
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+_db_file = Path(tempfile.mkdtemp()) / "bench.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_file}")
+
+from sqlalchemy import event  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models import Classroom, Course, GradeRecord, Student  # noqa: E402
+from app.utils import upsert_grade_scores  # noqa: E402
+
+CLASS_SIZE = 60
+
+
+def legacy_save(student_ids, course_id, term, assessment_type, scores):
+    for student_id in student_ids:
+        record = GradeRecord.query.filter_by(
+            student_id=student_id,
+            course_id=course_id,
+            term=term,
+            assessment_type=assessment_type,
+        ).first()
+        if record:
+            record.score = scores[student_id]
+        else:
+            db.session.add(
+                GradeRecord(
+                    student_id=student_id,
+                    course_id=course_id,
+                    term=term,
+                    assessment_type=assessment_type,
+                    score=scores[student_id],
+                )
+            )
+    db.session.commit()
+
+
+def bulk_save(student_ids, course_id, term, assessment_type, scores):
+    upsert_grade_scores(course_id, term, assessment_type, scores)
+    db.session.commit()
+
+
+def measure(label, func, *args):
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    started = time.perf_counter()
+    func(*args)
+    elapsed = (time.perf_counter() - started) * 1000
+    event.remove(db.engine, "before_cursor_execute", count)
+    db.session.expunge_all()
+    print(f"{label:<28} {statements:>5} statements {elapsed:>9.2f} ms")
+
+
+def main() -> None:
+    app = create_app()
+    with app.app_context():
+        classroom = Classroom(name="bench-class")
+        course = Course(code="BENCH", name="bench-course")
+        db.session.add_all([classroom, course])
+        db.session.flush()
+        students = [
+            Student(
+                student_number=f"B{index:05d}",
+                name=f"student {index}",
+                gender="男",
+                date_of_birth=date(2006, 1, 1),
+                class_id=classroom.id,
+                email=f"b{index}@example.com",
+                phone="0",
+            )
+            for index in range(CLASS_SIZE)
+        ]
+        db.session.add_all(students)
+        db.session.commit()
+        student_ids = [student.id for student in students]
+        course_id = course.id
+
+        for label, func, term in (("per-row loop", legacy_save, "legacy"), ("bulk upsert", bulk_save, "bulk")):
+            first = {student_id: 60.0 for student_id in student_ids}
+            second = {student_id: 90.0 for student_id in student_ids}
+            measure(f"{label} (insert)", func, student_ids, course_id, term, "期末", first)
+            measure(f"{label} (update)", func, student_ids, course_id, term, "期末", second)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,3 +18,37 @@ class Config:
     UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", str(BASE_DIR / "app" / "static" / "uploads"))
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024
     REMEMBER_COOKIE_DURATION = 60 * 60 * 24 * 7
+    IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", 500))
+    IMPORT_REPORT_FOLDER = os.environ.get("IMPORT_REPORT_FOLDER", str(BASE_DIR / "import_reports"))
+    JOB_RUNNER = os.environ.get("JOB_RUNNER", "thread")  # thread: run in the web process; external: `flask worker` only
+    JOB_MAX_WORKERS = int(os.environ.get("JOB_MAX_WORKERS", 2))
+    JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", 20))
+    JOB_HEARTBEAT_INTERVAL = int(os.environ.get("JOB_HEARTBEAT_INTERVAL", 30))
+    JOB_STALE_AFTER = int(os.environ.get("JOB_STALE_AFTER", 120))  # running jobs without a heartbeat are failed
+    JOB_RESULT_FOLDER = os.environ.get("JOB_RESULT_FOLDER", str(BASE_DIR / "job_results"))
+    BACKUP_FOLDER = os.environ.get("BACKUP_FOLDER", str(BASE_DIR / "backups"))
+    BACKUP_CHUNK_SIZE = int(os.environ.get("BACKUP_CHUNK_SIZE", 5000))  # rows per primary-key chunk
+    RESTORE_WORKERS = int(os.environ.get("RESTORE_WORKERS", 4))  # tables loaded in parallel (SQLite: always 1)
+    RESTORE_CHUNK_SIZE = int(os.environ.get("RESTORE_CHUNK_SIZE", 2000))  # rows per multi-row INSERT
+    COUNT_CACHE_TTL = int(os.environ.get("COUNT_CACHE_TTL", 30))
+    COUNT_APPROXIMATE_LIMIT = int(os.environ.get("COUNT_APPROXIMATE_LIMIT", 10000))
+    PERMISSION_CACHE_TTL = int(os.environ.get("PERMISSION_CACHE_TTL", 60))
+    OPERATION_LOG_MODE = os.environ.get("OPERATION_LOG_MODE", "async")  # async: batched background writer; sync: inline
+    OPERATION_LOG_QUEUE_SIZE = int(os.environ.get("OPERATION_LOG_QUEUE_SIZE", 10000))
+    OPERATION_LOG_BATCH_SIZE = int(os.environ.get("OPERATION_LOG_BATCH_SIZE", 200))
+    OPERATION_LOG_FLUSH_MS = int(os.environ.get("OPERATION_LOG_FLUSH_MS", 500))
+    OPERATION_LOG_BLOCK_MS = int(os.environ.get("OPERATION_LOG_BLOCK_MS", 50))  # wait on a full queue, then drop
+    LOG_ARCHIVE_FOLDER = os.environ.get("LOG_ARCHIVE_FOLDER", str(BASE_DIR / "log_archive"))
+    LOG_ARCHIVE_BATCH_SIZE = int(os.environ.get("LOG_ARCHIVE_BATCH_SIZE", 5000))
+    SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "auto")  # auto: FULLTEXT/FTS5 by dialect; like: plain LIKE
+    SUGGEST_INDEX_TTL = int(os.environ.get("SUGGEST_INDEX_TTL", 300))
+    DASHBOARD_CACHE_TTL = int(os.environ.get("DASHBOARD_CACHE_TTL", 60))
+    TABLE_VERSION_TTL = int(os.environ.get("TABLE_VERSION_TTL", 5))  # staleness bound for ETags across processes
+    API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", 100))
+    API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", 1000))
+    API_STREAM_BATCH_SIZE = int(os.environ.get("API_STREAM_BATCH_SIZE", 1000))  # rows per fetch for NDJSON streams
+    API_BATCH_MAX_ITEMS = int(os.environ.get("API_BATCH_MAX_ITEMS", 5000))
+    API_BATCH_CHUNK_SIZE = int(os.environ.get("API_BATCH_CHUNK_SIZE", 0))  # 0: the whole batch in one transaction
+    API_CACHE_MAX_AGE = int(os.environ.get("API_CACHE_MAX_AGE", 10))
+    GRADE_PASS_MARK = float(os.environ.get("GRADE_PASS_MARK", 60))
+    GPA_ASSESSMENT_TYPE = os.environ.get("GPA_ASSESSMENT_TYPE", "期末")  # assessment that counts toward GPA
@@ -77,6 +77,7 @@ CREATE TABLE courses (
     description TEXT NULL,
     classroom_id INT NULL,
     teacher_id INT NULL,
+    FULLTEXT INDEX ft_courses_name (name) WITH PARSER ngram,
     CONSTRAINT fk_courses_classroom FOREIGN KEY (classroom_id) REFERENCES classrooms(id) ON DELETE SET NULL,
     CONSTRAINT fk_courses_teacher FOREIGN KEY (teacher_id) REFERENCES teachers(id) ON DELETE SET NULL
 ) ENGINE=InnoDB;
@@ -106,6 +107,7 @@ CREATE TABLE students (
     guardian_phone VARCHAR(20) NULL,
     avatar_path VARCHAR(255) NULL,
     enrollment_date DATE NULL,
+    FULLTEXT INDEX ft_students_search (student_number, name, email) WITH PARSER ngram,
     CONSTRAINT fk_students_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL,
     CONSTRAINT fk_students_class FOREIGN KEY (class_id) REFERENCES classrooms(id) ON DELETE SET NULL
 ) ENGINE=InnoDB;
@@ -127,21 +129,82 @@ CREATE TABLE grade_records (
     score FLOAT NOT NULL,
     remark VARCHAR(255) NULL,
     recorded_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_grade_records_natural_key UNIQUE (student_id, course_id, term, assessment_type),
+    INDEX ix_grade_records_course_term (course_id, term, assessment_type),
+    INDEX ix_grade_records_recorded_at (recorded_at, id),
     CONSTRAINT fk_grade_records_student FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
     CONSTRAINT fk_grade_records_course FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
+CREATE TABLE grade_aggregates (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    class_id INT NOT NULL DEFAULT 0,
+    course_id INT NOT NULL,
+    term VARCHAR(20) NOT NULL,
+    assessment_type VARCHAR(50) NOT NULL,
+    score_count INT NOT NULL DEFAULT 0,
+    score_sum DOUBLE NOT NULL DEFAULT 0,
+    score_sum_sq DOUBLE NOT NULL DEFAULT 0,
+    min_score FLOAT NULL,
+    max_score FLOAT NULL,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    CONSTRAINT uq_grade_aggregates_key UNIQUE (class_id, course_id, term, assessment_type),
+    INDEX ix_grade_aggregates_course (course_id, term)
+) ENGINE=InnoDB;
+
+CREATE TABLE student_gpa (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    student_id INT NOT NULL,
+    term VARCHAR(20) NOT NULL,
+    class_id INT NOT NULL DEFAULT 0,
+    grade_level VARCHAR(20) NOT NULL DEFAULT '',
+    course_count INT NOT NULL DEFAULT 0,
+    credits FLOAT NOT NULL DEFAULT 0,
+    weighted_average FLOAT NOT NULL DEFAULT 0,
+    gpa FLOAT NOT NULL DEFAULT 0,
+    class_rank INT NULL,
+    class_size INT NULL,
+    grade_rank INT NULL,
+    grade_size INT NULL,
+    computed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_student_gpa_student_term UNIQUE (student_id, term),
+    INDEX ix_student_gpa_cohort (term, grade_level),
+    INDEX ix_student_gpa_class_rank (class_id, term, class_rank)
+) ENGINE=InnoDB;
+
+CREATE TABLE student_gpa_cohorts (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    term VARCHAR(20) NOT NULL,
+    grade_level VARCHAR(20) NOT NULL DEFAULT '',
+    computed_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_student_gpa_cohorts_key UNIQUE (term, grade_level)
+) ENGINE=InnoDB;
+
 CREATE TABLE attendance_records (
     id INT AUTO_INCREMENT PRIMARY KEY,
     student_id INT NOT NULL,
     course_id INT NULL,
+    course_key INT AS (COALESCE(course_id, 0)) VIRTUAL NOT NULL,
     record_date DATE NOT NULL,
     status VARCHAR(20) NOT NULL,
     remarks VARCHAR(255) NULL,
+    CONSTRAINT uq_attendance_records_natural_key UNIQUE (student_id, course_key, record_date),
+    INDEX ix_attendance_records_course_date (course_id, record_date),
+    INDEX ix_attendance_records_record_date (record_date, status),
     CONSTRAINT fk_attendance_student FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
     CONSTRAINT fk_attendance_course FOREIGN KEY (course_id) REFERENCES courses(id) ON DELETE SET NULL
 ) ENGINE=InnoDB;
 
+CREATE TABLE attendance_daily (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    record_date DATE NOT NULL,
+    class_id INT NOT NULL DEFAULT 0,
+    course_id INT NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL,
+    record_count INT NOT NULL DEFAULT 0,
+    CONSTRAINT uq_attendance_daily_key UNIQUE (record_date, class_id, course_id, status)
+) ENGINE=InnoDB;
+
 CREATE TABLE leave_requests (
     id INT AUTO_INCREMENT PRIMARY KEY,
     student_id INT NOT NULL,
@@ -152,6 +215,7 @@ CREATE TABLE leave_requests (
     approver_id INT NULL,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
     reviewed_at DATETIME NULL,
+    INDEX ix_leave_requests_created_at (created_at, id),
     CONSTRAINT fk_leave_requests_student FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
     CONSTRAINT fk_leave_requests_approver FOREIGN KEY (approver_id) REFERENCES users(id) ON DELETE SET NULL
 ) ENGINE=InnoDB;
@@ -175,6 +239,7 @@ CREATE TABLE todo_items (
     due_date DATE NULL,
     is_completed TINYINT(1) NOT NULL DEFAULT 0,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_todo_items_user_status_due (user_id, is_completed, due_date),
     CONSTRAINT fk_todo_items_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
@@ -185,6 +250,7 @@ CREATE TABLE system_messages (
     body TEXT NOT NULL,
     is_read TINYINT(1) NOT NULL DEFAULT 0,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_system_messages_user_read (user_id, is_read, created_at),
     CONSTRAINT fk_system_messages_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
@@ -194,6 +260,12 @@ CREATE TABLE system_settings (
     description VARCHAR(255) NULL
 ) ENGINE=InnoDB;
 
+CREATE TABLE table_versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB;
+
 CREATE TABLE data_backups (
     id INT AUTO_INCREMENT PRIMARY KEY,
     filename VARCHAR(255) NOT NULL,
@@ -211,6 +283,7 @@ CREATE TABLE operation_logs (
     description VARCHAR(255) NULL,
     ip_address VARCHAR(45) NULL,
     created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX ix_operation_logs_created_at (created_at, id),
     CONSTRAINT fk_operation_logs_user FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
 ) ENGINE=InnoDB;
 
@@ -224,6 +297,26 @@ CREATE TABLE uploaded_files (
     CONSTRAINT fk_uploaded_files_user FOREIGN KEY (uploader_id) REFERENCES users(id) ON DELETE SET NULL
 ) ENGINE=InnoDB;
 
+CREATE TABLE jobs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    params TEXT NULL,
+    progress INT NOT NULL DEFAULT 0,
+    message VARCHAR(255) NULL,
+    result TEXT NULL,
+    result_path VARCHAR(255) NULL,
+    result_name VARCHAR(255) NULL,
+    cancel_requested TINYINT(1) NOT NULL DEFAULT 0,
+    created_by INT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME NULL,
+    heartbeat_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    INDEX ix_jobs_status (status),
+    CONSTRAINT fk_jobs_user FOREIGN KEY (created_by) REFERENCES users(id) ON DELETE SET NULL
+) ENGINE=InnoDB;
+
 -- 预置权限
 INSERT INTO permissions (code, name, category) VALUES
 ('dashboard.view', '查看仪表盘', 'menu'),